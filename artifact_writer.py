@@ -0,0 +1,108 @@
+import os
+import json
+import queue
+import atexit
+import threading
+import cv2
+
+ARTIFACT_FORMATS = {
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'png': ('.png', cv2.IMWRITE_PNG_COMPRESSION),
+    'none': (None, None)
+}
+
+_STOP = object()
+
+class ArtifactWriter:
+    def __init__(self, image_format='jpeg', jpeg_quality=95, png_compression=3, annotate_frames=False,
+                 max_queue=64, background=True):
+        if image_format not in ARTIFACT_FORMATS:
+            raise ValueError(f"Unknown artifact format: {image_format}")
+        self.image_format = image_format
+        self.extension, flag = ARTIFACT_FORMATS[image_format]
+        quality = jpeg_quality if image_format == 'jpeg' else png_compression
+        self.write_params = [flag, int(quality)] if flag is not None else []
+        self.annotate_frames = annotate_frames
+        self.errors = 0
+        self.thread = None
+
+        if background:
+            # Bounded so a slow disk pushes back on the producers instead of
+            # letting queued frames pile up in memory.
+            self.queue = queue.Queue(maxsize=max_queue)
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    def run(self):
+        while True:
+            task = self.queue.get()
+            try:
+                if task is _STOP:
+                    return
+                task[0](*task[1:])
+            except Exception as e:
+                self.errors += 1
+                print(f"Error writing artifact: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    def submit(self, *task):
+        if self.thread is None:
+            task[0](*task[1:])
+        else:
+            self.queue.put(task)
+
+    def write_image(self, path, image):
+        cv2.imwrite(path, image, self.write_params)
+
+    def write_json(self, path, data):
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    def write_annotated(self, path, image, plate_info):
+        annotated = image.copy()
+        for plate in plate_info:
+            x1, y1, x2, y2 = plate['bbox']
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            label = plate.get('recognized_text') or f"{plate.get('detection_confidence', 0.0):.2f}"
+            cv2.putText(annotated, label, (x1, max(y1 - 10, 0)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        self.write_image(path, annotated)
+
+    def save_crops(self, plate_info, output_dir):
+        if self.extension is None:
+            return
+
+        os.makedirs(output_dir, exist_ok=True)
+        for idx, plate_data in enumerate(plate_info):
+            cropped_plate = plate_data['cropped_image']
+            if cropped_plate.size > 0:
+                crop_path = os.path.join(output_dir, f"plate_{idx}_{plate_data['confidence']:.2f}{self.extension}")
+                self.submit(self.write_image, crop_path, cropped_plate)
+                plate_data['image_path'] = crop_path
+
+    def save_annotated(self, image, plate_info, output_dir):
+        if self.extension is None or not self.annotate_frames or image is None:
+            return None
+
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"annotated{self.extension}")
+        self.submit(self.write_annotated, path, image, plate_info)
+        return path
+
+    def save_json(self, data, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.submit(self.write_json, path, data)
+
+    def flush(self):
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.thread = None
@@ -0,0 +1,113 @@
+import os
+import time
+import argparse
+import statistics
+import cv2
+from detect_plate_yolo_enhanced import LicensePlateDetector
+from detector_backends import default_backend_path
+from plate_tracker import box_iou
+
+def load_images(image_directory, limit=None):
+    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+    images = []
+    
+    for filename in sorted(os.listdir(image_directory)):
+        if any(filename.lower().endswith(ext) for ext in image_extensions):
+            image = cv2.imread(os.path.join(image_directory, filename))
+            if image is not None:
+                images.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            if limit and len(images) >= limit:
+                break
+    
+    return images
+
+def time_detector(detector, images, repeats=3, warmup=2):
+    for image in images[:warmup]:
+        detector.run_model([image])
+    
+    timings = []
+    detections = []
+    for _ in range(repeats):
+        detections = []
+        for image in images:
+            start = time.perf_counter()
+            detections.append(detector.run_model([image])[0])
+            timings.append((time.perf_counter() - start) * 1000)
+    
+    return timings, detections
+
+def detection_parity(reference, candidate, iou_threshold=0.5):
+    matched = 0
+    confidence_deltas = []
+    
+    for expected, actual in zip(reference, candidate):
+        if len(expected) == 0 or len(actual) == 0:
+            continue
+        iou = box_iou(expected[:, :4], actual[:, :4])
+        best = iou.argmax(axis=1)
+        for row, column in enumerate(best):
+            if iou[row, column] >= iou_threshold and expected[row, 5] == actual[column, 5]:
+                matched += 1
+                confidence_deltas.append(abs(float(expected[row, 4]) - float(actual[column, 4])))
+    
+    total = sum(len(expected) for expected in reference)
+    return {
+        'reference_boxes': total,
+        'candidate_boxes': sum(len(actual) for actual in candidate),
+        'recall': matched / float(total) if total else 1.0,
+        'max_confidence_delta': max(confidence_deltas) if confidence_deltas else 0.0
+    }
+
+def compare_backends(image_directory, backends=('torch', 'torchscript', 'onnx', 'onnx-int8'),
+                     confidence_threshold=0.15, repeats=3, limit=None, backend_dir=None):
+    # backend_dir: where exported models are written and looked up; the
+    # default is the detector's own (models/).
+    images = load_images(image_directory, limit)
+    if not images:
+        print(f"No images found in {image_directory}")
+        return None
+    
+    report = {}
+    reference = None
+    for name in backends:
+        backend, _, variant = name.partition('-')
+        backend_path = None
+        if backend_dir and backend != 'torch':
+            backend_path = default_backend_path(backend, int8=variant == 'int8', directory=backend_dir)
+        detector = LicensePlateDetector(confidence_threshold=confidence_threshold, backend=backend,
+                                        backend_path=backend_path, int8=variant == 'int8')
+        timings, detections = time_detector(detector, images, repeats)
+        report[name] = {
+            'images': len(images),
+            'mean_ms': statistics.mean(timings),
+            'median_ms': statistics.median(timings),
+            'startup': detector.startup_timings
+        }
+        if reference is None:
+            reference = detections
+        else:
+            report[name]['parity'] = detection_parity(reference, detections)
+    
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare detector backend latency and parity")
+    parser.add_argument("image_directory", nargs="?", default="examples")
+    parser.add_argument("--backends", default="torch,torchscript,onnx,onnx-int8")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+    
+    if os.path.exists(args.image_directory):
+        report = compare_backends(args.image_directory, args.backends.split(','), repeats=args.repeats,
+                                  limit=args.limit)
+        if report:
+            for name, stats in report.items():
+                line = f"{name:>12}: mean {stats['mean_ms']:.1f} ms, median {stats['median_ms']:.1f} ms"
+                if 'parity' in stats:
+                    parity = stats['parity']
+                    line += (f", recall vs torch {parity['recall']:.0%}, "
+                             f"max confidence delta {parity['max_confidence_delta']:.3f}")
+                print(line)
+    else:
+        print(f"Image directory not found: {args.image_directory}")
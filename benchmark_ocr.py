@@ -0,0 +1,82 @@
+import os
+import time
+import argparse
+import statistics
+from ocr_plate_enhanced import LicensePlateOCR
+
+def load_crops(ocr, crop_directory, limit=None):
+    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+    crops = []
+    
+    for filename in sorted(os.listdir(crop_directory)):
+        if any(filename.lower().endswith(ext) for ext in image_extensions):
+            crops.append((filename, ocr.load_image(os.path.join(crop_directory, filename))))
+            if limit and len(crops) >= limit:
+                break
+    
+    return crops
+
+def time_mode(ocr, mode, crops, repeats=3, warmup=2):
+    ocr.mode = mode
+    
+    for _, crop in crops[:warmup]:
+        ocr.extract_text_from_image(crop)
+    
+    timings = []
+    texts = {}
+    for _ in range(repeats):
+        for filename, crop in crops:
+            start = time.perf_counter()
+            result = ocr.extract_text_from_image(crop)
+            timings.append((time.perf_counter() - start) * 1000)
+            texts[filename] = result['best_text']
+    
+    return timings, texts
+
+def compare_ocr_modes(crop_directory, repeats=3, limit=None, policy='both'):
+    ocr = LicensePlateOCR(policy=policy)
+    crops = load_crops(ocr, crop_directory, limit)
+    if not crops:
+        print(f"No plate crops found in {crop_directory}")
+        return None
+    
+    report = {}
+    texts_by_mode = {}
+    for mode in ('detect', 'recognize'):
+        timings, texts = time_mode(ocr, mode, crops, repeats)
+        texts_by_mode[mode] = texts
+        report[mode] = {
+            'plates': len(crops),
+            'mean_ms': statistics.mean(timings),
+            'median_ms': statistics.median(timings),
+            'max_ms': max(timings)
+        }
+    
+    agreement = sum(
+        texts_by_mode['detect'][filename] == texts_by_mode['recognize'][filename]
+        for filename, _ in crops
+    ) / float(len(crops))
+    report['speedup'] = report['detect']['mean_ms'] / report['recognize']['mean_ms']
+    report['text_agreement'] = agreement
+    
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare readtext and recognizer-only OCR latency on plate crops")
+    parser.add_argument("crop_directory", nargs="?", default="detected_plates")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--policy", choices=("both", "cascade"), default="both")
+    args = parser.parse_args()
+    
+    if os.path.exists(args.crop_directory):
+        report = compare_ocr_modes(args.crop_directory, args.repeats, args.limit, args.policy)
+        if report:
+            for mode in ('detect', 'recognize'):
+                stats = report[mode]
+                print(f"{mode:>9}: mean {stats['mean_ms']:.1f} ms, median {stats['median_ms']:.1f} ms, "
+                      f"max {stats['max_ms']:.1f} ms over {stats['plates']} plates")
+            print(f"Speedup: {report['speedup']:.2f}x")
+            print(f"Best-text agreement: {report['text_agreement']:.0%}")
+    else:
+        print(f"Crop directory not found: {args.crop_directory}")
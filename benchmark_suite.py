@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import resource
+from datetime import datetime
+import cv2
+import numpy as np
+
+PLATE_LETTERS = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+PLATE_DIGITS = '0123456789'
+PLATE_PATTERNS = ('LLDDLLL', 'LLLDDDD', 'LLDDDD', 'LLLDDDL')
+
+def generate_plate_text(rng):
+    pattern = rng.choice(PLATE_PATTERNS)
+    return ''.join(rng.choice(PLATE_LETTERS if char == 'L' else PLATE_DIGITS) for char in pattern)
+
+def render_plate(text, rng, height=110):
+    width = int(height * 4.7)
+    plate = np.full((height, width, 3), rng.choice([(245, 245, 245), (40, 200, 250)]), dtype=np.uint8)
+    cv2.rectangle(plate, (3, 3), (width - 4, height - 4), (20, 20, 20), 3)
+
+    font = cv2.FONT_HERSHEY_DUPLEX
+    scale = cv2.getFontScaleFromHeight(font, int(height * 0.6), 4)
+    (text_width, text_height), _ = cv2.getTextSize(text, font, scale, 4)
+    scale *= min(1.0, (width - 30) / float(text_width))
+    (text_width, text_height), _ = cv2.getTextSize(text, font, scale, 4)
+    origin = ((width - text_width) // 2, (height + text_height) // 2)
+    cv2.putText(plate, text, origin, font, scale, (15, 15, 15), 4, cv2.LINE_AA)
+    return plate
+
+def render_scene(rng, width=1280, height=720):
+    np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+
+    # Road-like background with a vertical gradient and some texture.
+    gradient = np.linspace(90, 170, height, dtype=np.float32)[:, None, None]
+    scene = np.clip(gradient + np_rng.normal(0, 12, (height, width, 3)), 0, 255).astype(np.uint8)
+
+    car_width = rng.randint(width // 4, width // 2)
+    car_height = int(car_width * rng.uniform(0.55, 0.75))
+    car_x = rng.randint(0, width - car_width)
+    car_y = rng.randint(height // 6, height - car_height)
+    car_colour = tuple(rng.randint(20, 230) for _ in range(3))
+    cv2.rectangle(scene, (car_x, car_y), (car_x + car_width, car_y + car_height), car_colour, -1)
+    cv2.rectangle(scene, (car_x + car_width // 8, car_y + car_height // 10),
+                  (car_x + car_width * 7 // 8, car_y + car_height * 2 // 5), (60, 60, 70), -1)
+
+    text = generate_plate_text(rng)
+    plate = render_plate(text, rng)
+    plate_width = int(car_width * rng.uniform(0.25, 0.4))
+    plate_height = int(plate_width / 4.7)
+    plate_x = car_x + (car_width - plate_width) // 2 + rng.randint(-car_width // 10, car_width // 10)
+    plate_y = car_y + int(car_height * rng.uniform(0.6, 0.8))
+    plate_x = min(max(plate_x, 0), width - plate_width - 1)
+    plate_y = min(max(plate_y, 0), height - plate_height - 1)
+
+    # Small random perspective so plates are not perfectly axis aligned.
+    jitter = plate_height * 0.15
+    source = np.float32([[0, 0], [plate.shape[1], 0], [plate.shape[1], plate.shape[0]], [0, plate.shape[0]]])
+    target = np.float32([
+        [plate_x + rng.uniform(-jitter, jitter), plate_y + rng.uniform(-jitter, jitter)],
+        [plate_x + plate_width + rng.uniform(-jitter, jitter), plate_y + rng.uniform(-jitter, jitter)],
+        [plate_x + plate_width + rng.uniform(-jitter, jitter), plate_y + plate_height + rng.uniform(-jitter, jitter)],
+        [plate_x + rng.uniform(-jitter, jitter), plate_y + plate_height + rng.uniform(-jitter, jitter)]
+    ])
+    transform = cv2.getPerspectiveTransform(source, target)
+    warped = cv2.warpPerspective(plate, transform, (width, height))
+    mask = cv2.warpPerspective(np.full(plate.shape[:2], 255, np.uint8), transform, (width, height))
+    scene[mask > 0] = warped[mask > 0]
+
+    blur = rng.choice([1, 3, 3, 5])
+    if blur > 1:
+        scene = cv2.GaussianBlur(scene, (blur, blur), 0)
+    scene = np.clip(scene.astype(np.float32) + np_rng.normal(0, rng.uniform(2, 10), scene.shape), 0, 255)
+
+    x1, y1 = np.floor(target.min(axis=0)).astype(int)
+    x2, y2 = np.ceil(target.max(axis=0)).astype(int)
+    bbox = (int(max(x1, 0)), int(max(y1, 0)), int(min(x2, width)), int(min(y2, height)))
+    return scene.astype(np.uint8), {'text': text, 'bbox': bbox}
+
+def generate_dataset(output_dir, count=50, seed=0, width=1280, height=720):
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    ground_truth = []
+
+    for idx in range(count):
+        scene, truth = render_scene(rng, width, height)
+        filename = f"synthetic_{idx:05d}.jpg"
+        cv2.imwrite(os.path.join(output_dir, filename), scene, [cv2.IMWRITE_JPEG_QUALITY, 92])
+        truth['filename'] = filename
+        ground_truth.append(truth)
+
+    with open(os.path.join(output_dir, "ground_truth.json"), 'w') as f:
+        json.dump({'seed': seed, 'count': count, 'images': ground_truth}, f, indent=2)
+
+    print(f"Generated {count} synthetic scenes in {output_dir}")
+    return ground_truth
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+def summarize_latencies(latencies_ms, items, wall_seconds):
+    latencies = np.asarray(latencies_ms, dtype=np.float64)
+    return {
+        'items': items,
+        'throughput_per_s': items / wall_seconds if wall_seconds > 0 else 0.0,
+        'mean_ms': float(latencies.mean()) if len(latencies) else 0.0,
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def box_recall(detections, truth_bbox, iou_threshold=0.5):
+    from plate_tracker import box_iou
+    if not detections:
+        return False
+    return bool((box_iou([truth_bbox], [plate['bbox'] for plate in detections]) >= iou_threshold).any())
+
+def character_accuracy(expected, actual):
+    expected, actual = expected.replace(' ', ''), (actual or '').replace(' ', '')
+    if not expected:
+        return 1.0 if not actual else 0.0
+    previous = list(range(len(actual) + 1))
+    for i, expected_char in enumerate(expected, 1):
+        current = [i]
+        for j, actual_char in enumerate(actual, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (expected_char != actual_char)))
+        previous = current
+    return max(0.0, 1.0 - previous[-1] / float(len(expected)))
+
+def benchmark_detector(detector, images, truths):
+    latencies = []
+    recalled = 0
+    start = time.perf_counter()
+    for image, truth in zip(images, truths):
+        stage_start = time.perf_counter()
+        plates = detector.detect_plates(image, save_crops=False, display=False)
+        latencies.append((time.perf_counter() - stage_start) * 1000)
+        recalled += box_recall(plates, truth['bbox'])
+    report = summarize_latencies(latencies, len(images), time.perf_counter() - start)
+    report['box_recall'] = recalled / float(len(images))
+    return report
+
+def benchmark_ocr(ocr, images, truths):
+    latencies = []
+    exact = 0
+    char_scores = []
+    start = time.perf_counter()
+    for image, truth in zip(images, truths):
+        x1, y1, x2, y2 = truth['bbox']
+        crop = image[y1:y2, x1:x2]
+        stage_start = time.perf_counter()
+        result = ocr.extract_text_from_image(crop)
+        latencies.append((time.perf_counter() - stage_start) * 1000)
+        exact += result['best_text'].replace(' ', '') == truth['text']
+        char_scores.append(character_accuracy(truth['text'], result['best_text']))
+    report = summarize_latencies(latencies, len(images), time.perf_counter() - start)
+    report['exact_match'] = exact / float(len(images))
+    report['char_accuracy'] = float(np.mean(char_scores))
+    return report
+
+def benchmark_pipeline(pipeline, image_paths, truths, output_dir):
+    latencies = []
+    exact = 0
+    start = time.perf_counter()
+    for image_path, truth in zip(image_paths, truths):
+        stage_start = time.perf_counter()
+        result = pipeline.process_image(image_path, output_dir=output_dir, save_intermediates=False)
+        latencies.append((time.perf_counter() - stage_start) * 1000)
+        exact += any(plate['recognized_text'].replace(' ', '') == truth['text'] for plate in result['plates'])
+    report = summarize_latencies(latencies, len(image_paths), time.perf_counter() - start)
+    report['plate_found'] = exact / float(len(image_paths))
+    return report
+
+def load_dataset(dataset_dir, count=50, seed=0):
+    # A stored dataset is reused only if it was generated from the same seed
+    # and has at least count images; the first count images of a larger set
+    # are the same scenes. Anything else is regenerated, so runs with the same
+    # --count and --seed always compare the same images.
+    truth_file = os.path.join(dataset_dir, "ground_truth.json")
+    if os.path.exists(truth_file):
+        with open(truth_file) as f:
+            dataset = json.load(f)
+        if dataset.get('seed') == seed and len(dataset['images']) >= count:
+            return dataset
+        print(f"{truth_file} was generated with seed {dataset.get('seed')} and {len(dataset['images'])} images; "
+              f"regenerating with seed {seed} and {count} images")
+    generate_dataset(dataset_dir, count, seed)
+    with open(truth_file) as f:
+        return json.load(f)
+
+def run_benchmarks(dataset_dir, count=50, seed=0, stages=('detector', 'ocr', 'pipeline'), pipeline_options=None,
+                   warmup=2):
+    from license_plate_pipeline import LicensePlatePipeline
+
+    dataset = load_dataset(dataset_dir, count, seed)
+    truths = dataset['images'][:count]
+    image_paths = [os.path.join(dataset_dir, truth['filename']) for truth in truths]
+
+    pipeline_options = dict(pipeline_options or {})
+    pipeline_options.setdefault('headless', True)
+    start = time.perf_counter()
+    pipeline = LicensePlatePipeline(**pipeline_options)
+    startup_seconds = time.perf_counter() - start
+
+    images = [cv2.imread(path) for path in image_paths]
+    for image in images[:warmup]:
+        pipeline.detector.detect_plates(image, save_crops=False, display=False)
+        pipeline.ocr.extract_text_from_image(image[:100, :400])
+
+    report = {
+        'created': datetime.now().isoformat(),
+        'dataset': {'path': dataset_dir, 'seed': dataset['seed'], 'images': len(truths)},
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'pipeline_options': pipeline_options,
+        'startup_seconds': startup_seconds,
+        'stages': {}
+    }
+
+    if 'detector' in stages:
+        report['stages']['detector'] = benchmark_detector(pipeline.detector, images, truths)
+    if 'ocr' in stages:
+        report['stages']['ocr'] = benchmark_ocr(pipeline.ocr, images, truths)
+    if 'pipeline' in stages:
+        report['stages']['pipeline'] = benchmark_pipeline(pipeline, image_paths, truths,
+                                                          os.path.join(dataset_dir, "benchmark_results"))
+
+    pipeline.close()
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the plate pipeline on synthetic scenes")
+    parser.add_argument("--dataset", default="benchmark_data")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default="detector,ocr,pipeline")
+    parser.add_argument("--options", default="{}", help="JSON dict of LicensePlatePipeline keyword arguments")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--generate-only", action="store_true")
+    args = parser.parse_args()
+
+    if args.generate_only:
+        generate_dataset(args.dataset, args.count, args.seed)
+        sys.exit(0)
+
+    report = run_benchmarks(args.dataset, args.count, args.seed, args.stages.split(','), json.loads(args.options))
+    output = args.output or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for stage, stats in report['stages'].items():
+        print(f"{stage:>9}: {stats['throughput_per_s']:.2f}/s, p50 {stats['p50_ms']:.1f} ms, "
+              f"p95 {stats['p95_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+    print(f"Peak RSS: {report['peak_rss_mb']:.0f} MB")
+    print(f"Report saved to: {output}")
@@ -1,70 +1,320 @@
+import sys
+import time
 import torch
 import cv2
 import numpy as np
-from matplotlib import pyplot as plt
 import os
 from pathlib import Path
+from detector_backends import MAX_WH, default_backend_path, export_backend, load_backend, nms, tile_origins
+from pipeline_metrics import timed
+
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8
+}
 
 class LicensePlateDetector:
-    def __init__(self, model_path=None, confidence_threshold=0.15):
+    def __init__(self, model_path=None, confidence_threshold=0.15, model_dir=None, offline=False,
+                 serialized_path=None, force_reload=False, backend='torch', backend_path=None, int8=False,
+                 inference_size=640, iou_threshold=0.45, backend_threads=None, detection_filter=None,
+                 detect_max_side=None, tile_size=None, tile_overlap=0.2, decode_reduction=1, views_per_pass=8):
         self.confidence_threshold = confidence_threshold
+        self.iou_threshold = iou_threshold
+        self.inference_size = inference_size
+        self.detection_filter = detection_filter
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.startup_timings = {}
+        self.model = None
+        self.backend = None
+        self.backend_name = backend
+        
+        if backend != 'torch':
+            backend_path = backend_path or default_backend_path(backend, model_path, int8,
+                                                                model_dir or 'models')
+            if os.path.exists(backend_path):
+                # An exported model needs neither torch.hub nor the yolov5 repo.
+                start = time.perf_counter()
+                self.backend = load_backend(backend, backend_path, backend_threads)
+                self.startup_timings['detector_backend_load'] = time.perf_counter() - start
+        
+        if self.backend is None:
+            self.load_hub_model(model_path, model_dir, offline, serialized_path, force_reload)
+            
+            if backend != 'torch':
+                start = time.perf_counter()
+                export_backend(self.model, backend, backend_path, size=inference_size, int8=int8)
+                self.backend = load_backend(backend, backend_path, backend_threads)
+                self.startup_timings['detector_backend_export'] = time.perf_counter() - start
         
-        if model_path and os.path.exists(model_path):
-            self.model = torch.hub.load('ultralytics/yolov5', 'custom', 
-                                      path=model_path, force_reload=True)
+        if self.backend is not None:
+            # Exported models have a fixed input size.
+            self.inference_size = self.backend.size
+        self.configure_resolution(detect_max_side, tile_size, tile_overlap, decode_reduction, views_per_pass)
+    
+    def load_hub_model(self, model_path, model_dir, offline, serialized_path, force_reload):
+        start = time.perf_counter()
+        if serialized_path and os.path.exists(serialized_path):
+            self.model = self.load_serialized(serialized_path, model_dir)
+            self.startup_timings['detector_serialized_load'] = time.perf_counter() - start
+        elif model_dir:
+            # A pinned local checkout of ultralytics/yolov5 with its weights
+            # next to it; torch.hub never touches the network for source='local'.
+            weights = model_path or os.path.join(model_dir, 'yolov5s.pt')
+            self.model = torch.hub.load(os.path.join(model_dir, 'yolov5'), 'custom',
+                                        path=weights, source='local')
+            self.startup_timings['detector_local_load'] = time.perf_counter() - start
+        elif offline:
+            raise ValueError("Offline detector startup needs model_dir or an existing serialized_path")
         else:
-            self.model = torch.hub.load('ultralytics/yolov5', 'yolov5s', 
-                                      pretrained=True)
+            if model_path and os.path.exists(model_path):
+                self.model = torch.hub.load('ultralytics/yolov5', 'custom', 
+                                          path=model_path, force_reload=force_reload)
+            else:
+                self.model = torch.hub.load('ultralytics/yolov5', 'yolov5s', 
+                                          pretrained=True)
+            self.startup_timings['detector_hub_load'] = time.perf_counter() - start
         
+        start = time.perf_counter()
         self.model.to(self.device)
-        self.model.conf = confidence_threshold
+        self.model.conf = self.confidence_threshold
+        self.model.iou = self.iou_threshold
+        self.startup_timings['detector_to_device'] = time.perf_counter() - start
     
-    def detect_plates(self, image_path, save_crops=True, output_dir='detected_plates'):
-        if save_crops:
-            os.makedirs(output_dir, exist_ok=True)
+    def load_serialized(self, serialized_path, model_dir=None):
+        # Unpickling needs the yolov5 modules the model was built from.
+        if model_dir and os.path.join(model_dir, 'yolov5') not in sys.path:
+            sys.path.insert(0, os.path.join(model_dir, 'yolov5'))
+        try:
+            return torch.load(serialized_path, map_location=self.device, weights_only=False)
+        except TypeError:
+            return torch.load(serialized_path, map_location=self.device)
+    
+    def save_serialized(self, serialized_path):
+        # Only the detector is serialized; the EasyOCR Reader always loads
+        # from its weight files.
+        if self.model is None:
+            raise ValueError("Only the torch backend can be serialized")
+        directory = os.path.dirname(serialized_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        torch.save(self.model, serialized_path)
+        print(f"Saved ready-to-run detector: {serialized_path}")
+    
+    def configure_resolution(self, detect_max_side=None, tile_size=None, tile_overlap=0.2, decode_reduction=1,
+                             views_per_pass=8):
+        # detect_max_side: run the model on a copy downscaled to this longest
+        # side, at that input size. tile_size: also run it on overlapping
+        # full-resolution tiles of this size, at that input size, for plates
+        # too small to survive the downscale. views_per_pass caps how many
+        # views go through one forward pass.
+        # decode_reduction: decode files at 1/2, 1/4 or 1/8 size; everything
+        # downstream, crops included, then works at that resolution.
+        if decode_reduction not in REDUCED_DECODE_FLAGS:
+            raise ValueError(f"decode_reduction must be one of {sorted(REDUCED_DECODE_FLAGS)}")
+        if not 0 <= tile_overlap < 1:
+            raise ValueError("tile_overlap must be in [0, 1)")
+        if self.backend is not None:
+            if detect_max_side and detect_max_side != self.inference_size:
+                raise ValueError(f"The {self.backend_name} detector runs at a fixed {self.inference_size}px input; "
+                                 f"export it with inference_size={detect_max_side} to detect at that size")
+            if tile_size and tile_size > self.inference_size:
+                raise ValueError(f"tile_size {tile_size} is larger than the {self.inference_size}px input of the "
+                                 f"{self.backend_name} detector, so tiles would be downscaled")
+        self.views_per_pass = max(1, views_per_pass)
+        self.detect_max_side = detect_max_side
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.decode_reduction = decode_reduction
+        self.decode_flag = REDUCED_DECODE_FLAGS[decode_reduction]
+    
+    def resolution_config(self):
+        return {
+            'detect_max_side': self.detect_max_side,
+            'tile_size': self.tile_size,
+            'tile_overlap': self.tile_overlap,
+            'decode_reduction': self.decode_reduction
+        }
+    
+    def load_image(self, image):
+        if isinstance(image, str):
+            img = cv2.imread(image, self.decode_flag)
+            if img is None:
+                raise ValueError(f"Could not load image from {image}")
+            return img
+        return image
+    
+    def decode_bytes(self, data):
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), self.decode_flag)
+    
+    def run_model(self, images_rgb, size=None):
+        # Returns one (N, 6) array of x1, y1, x2, y2, confidence, class per image.
+        # size is the model input's longest side; exported backends are fixed
+        # to the size they were exported at.
+        if self.backend is not None:
+            return self.backend.detect(images_rgb, self.confidence_threshold, self.iou_threshold)
+        
+        results = self.model(images_rgb, size=size or self.inference_size)
+        return [prediction.cpu().numpy() for prediction in results.xyxy]
+    
+    def detect_frames(self, images_rgb):
+        # Like run_model, but detections are always in the coordinates of the
+        # frames passed in, whatever resolution the model actually saw.
+        if self.detect_max_side is None and self.tile_size is None:
+            return self.run_model(images_rgb)
         
-        img = cv2.imread(image_path)
-        if img is None:
-            raise ValueError(f"Could not load image from {image_path}")
+        # Views are grouped by model input size and run views_per_pass at a
+        # time, so many tiles of many frames never become one huge batch.
+        views_by_size = {}
+        for image_idx, image in enumerate(images_rgb):
+            for pixels, scale, offset, size in self.detection_views(image):
+                views_by_size.setdefault(size, []).append((image_idx, pixels, scale, offset))
+        
+        parts = [[] for _ in images_rgb]
+        for size, views in views_by_size.items():
+            for start in range(0, len(views), self.views_per_pass):
+                chunk = views[start:start + self.views_per_pass]
+                view_detections = self.run_model([pixels for _, pixels, _, _ in chunk], size)
+                for (image_idx, _, scale, (x0, y0)), detections in zip(chunk, view_detections):
+                    if len(detections):
+                        detections = detections.copy()
+                        detections[:, [0, 2]] = detections[:, [0, 2]] / scale + x0
+                        detections[:, [1, 3]] = detections[:, [1, 3]] / scale + y0
+                        parts[image_idx].append(detections)
+        
+        return [self.merge_detections(image_parts) for image_parts in parts]
+    
+    def detection_views(self, image):
+        # (pixels, scale, (x0, y0), input size) so a view box maps back as
+        # box / scale + offset. Each view runs at an input size matching its
+        # own pixels, so the model neither shrinks tiles nor enlarges the
+        # downscaled copy.
+        height, width = image.shape[:2]
+        longest = max(height, width)
+        
+        if self.detect_max_side and longest > self.detect_max_side:
+            scale = self.detect_max_side / float(longest)
+            size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            views = [(cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale, (0, 0), self.detect_max_side)]
+        elif self.detect_max_side:
+            views = [(image, 1.0, (0, 0), longest)]
+        else:
+            views = [(image, 1.0, (0, 0), self.inference_size)]
+        
+        if self.tile_size and longest > self.tile_size:
+            for y0 in tile_origins(height, self.tile_size, self.tile_overlap):
+                for x0 in tile_origins(width, self.tile_size, self.tile_overlap):
+                    tile = image[y0:y0 + self.tile_size, x0:x0 + self.tile_size]
+                    views.append((tile, 1.0, (x0, y0), self.tile_size))
+        
+        return views
+    
+    def merge_detections(self, parts):
+        if not parts:
+            return np.zeros((0, 6), dtype=np.float32)
+        detections = np.concatenate(parts).astype(np.float32)
+        if len(parts) == 1:
+            return detections
+        # Class-aware NMS removes the copies of a plate seen by the overview
+        # and by one or more overlapping tiles.
+        keep = nms(detections[:, :4] + detections[:, 5:6] * MAX_WH, detections[:, 4], self.iou_threshold)
+        return detections[keep]
+    
+    def filter_detections(self, img, detections, timings=None):
+        if self.detection_filter is None:
+            return detections
+        with timed(timings, 'detection_filter'):
+            return self.detection_filter.apply(detections, img)
+    
+    def detect_plates(self, image_path, save_crops=True, output_dir='detected_plates', display=True,
+                      timings=None):
+        with timed(timings, 'decode'):
+            img = self.load_image(image_path)
         
         img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         
-        results = self.model(img_rgb)
+        with timed(timings, 'detector_inference'):
+            detections = self.detect_frames([img_rgb])[0]
+        detections = self.filter_detections(img, detections, timings)
+        with timed(timings, 'crop_extraction'):
+            plate_info = self.extract_plates(img, detections)
+        
+        if save_crops:
+            with timed(timings, 'artifact_write'):
+                self.save_crops(plate_info, output_dir)
+        
+        if display:
+            self.display_results(img_rgb, plate_info)
+        
+        return plate_info
+    
+    def detect_plates_batch(self, images, batch_size=8, save_crops=False, output_dir='detected_plates',
+                            timings=None):
+        # timings, if given, is one dict per image; batch-wide stages are
+        # shared evenly between the images of the batch.
+        all_plate_info = []
+        
+        for start in range(0, len(images), batch_size):
+            batch_timings = {}
+            with timed(batch_timings, 'decode'):
+                batch = [self.load_image(image) for image in images[start:start + batch_size]]
+            batch_rgb = [cv2.cvtColor(img, cv2.COLOR_BGR2RGB) for img in batch]
+            
+            # A list input is letterboxed into a single tensor, so the whole
+            # batch costs one forward pass on every backend.
+            with timed(batch_timings, 'detector_inference'):
+                batch_detections = self.detect_frames(batch_rgb)
+            
+            for offset, (img, detections) in enumerate(zip(batch, batch_detections)):
+                image_timings = timings[start + offset] if timings is not None else None
+                if image_timings is not None:
+                    for stage, seconds in batch_timings.items():
+                        image_timings[stage] = image_timings.get(stage, 0.0) + seconds / len(batch)
+                detections = self.filter_detections(img, detections, image_timings)
+                with timed(image_timings, 'crop_extraction'):
+                    plate_info = self.extract_plates(img, detections)
+                if save_crops:
+                    self.save_crops(plate_info, os.path.join(output_dir, f"image_{start + offset}"))
+                all_plate_info.append(plate_info)
         
-        detections = results.pandas().xyxy[0]
+        return all_plate_info
+    
+    def extract_plates(self, img, detections):
         plate_info = []
         
         print(f"Found {len(detections)} potential license plates")
         
-        for idx, detection in detections.iterrows():
-            x1, y1, x2, y2 = int(detection['xmin']), int(detection['ymin']), \
-                            int(detection['xmax']), int(detection['ymax'])
-            confidence = detection['confidence']
+        for detection in detections:
+            x1, y1, x2, y2 = (int(value) for value in detection[:4])
+            confidence = float(detection[4])
             
             cropped_plate = img[y1:y2, x1:x2]
             
-            plate_data = {
+            plate_info.append({
                 'bbox': (x1, y1, x2, y2),
                 'confidence': confidence,
                 'cropped_image': cropped_plate,
                 'image_path': None
-            }
-            
-            if save_crops and cropped_plate.size > 0:
-                crop_filename = f"plate_{idx}_{confidence:.2f}.jpg"
+            })
+        
+        return plate_info
+    
+    def save_crops(self, plate_info, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        
+        for idx, plate_data in enumerate(plate_info):
+            cropped_plate = plate_data['cropped_image']
+            if cropped_plate.size > 0:
+                crop_filename = f"plate_{idx}_{plate_data['confidence']:.2f}.jpg"
                 crop_path = os.path.join(output_dir, crop_filename)
                 cv2.imwrite(crop_path, cropped_plate)
                 plate_data['image_path'] = crop_path
                 print(f"Saved cropped plate: {crop_path}")
-            
-            plate_info.append(plate_data)
-        
-        self.display_results(img_rgb, plate_info)
-        
-        return plate_info
     
     def display_results(self, image, plate_info):
+        from matplotlib import pyplot as plt
+        
         fig, axes = plt.subplots(1, len(plate_info) + 1, figsize=(15, 5))
         if len(plate_info) == 0:
             axes = [axes]
@@ -0,0 +1,105 @@
+import threading
+import cv2
+import numpy as np
+
+# Order the rules run in; a box is counted against the first rule it fails.
+FILTER_RULES = ('class', 'size', 'aspect', 'edge_density', 'top_k')
+
+class DetectionFilter:
+    def __init__(self, allowed_classes=None, min_width=16, min_height=8, min_aspect=1.0, max_aspect=8.0,
+                 min_edge_density=0.0, top_k=None, edge_threshold=60, edge_max_side=640):
+        self.allowed_classes = None if allowed_classes is None else sorted(int(cls) for cls in allowed_classes)
+        self.min_width = min_width
+        self.min_height = min_height
+        self.min_aspect = min_aspect
+        self.max_aspect = max_aspect
+        self.min_edge_density = min_edge_density
+        self.top_k = top_k
+        self.edge_threshold = edge_threshold
+        self.edge_max_side = edge_max_side
+        
+        self.lock = threading.Lock()
+        self.boxes = 0
+        self.kept = 0
+        self.rejected = dict.fromkeys(FILTER_RULES, 0)
+        self.pending = dict.fromkeys(FILTER_RULES, 0)
+    
+    def config(self):
+        return {
+            'allowed_classes': self.allowed_classes,
+            'min_width': self.min_width,
+            'min_height': self.min_height,
+            'min_aspect': self.min_aspect,
+            'max_aspect': self.max_aspect,
+            'min_edge_density': self.min_edge_density,
+            'top_k': self.top_k,
+            'edge_threshold': self.edge_threshold,
+            'edge_max_side': self.edge_max_side
+        }
+    
+    def apply(self, detections, image=None):
+        # detections: (N, 6) rows of x1, y1, x2, y2, confidence, class.
+        keep = np.ones(len(detections), dtype=bool)
+        self.boxes += len(detections)
+        if len(detections) == 0:
+            return detections
+        
+        widths = detections[:, 2] - detections[:, 0]
+        heights = detections[:, 3] - detections[:, 1]
+        
+        if self.allowed_classes is not None:
+            self.reject(keep, 'class', np.isin(detections[:, 5].astype(np.int64), self.allowed_classes))
+        self.reject(keep, 'size', (widths >= self.min_width) & (heights >= self.min_height))
+        aspect = widths / np.maximum(heights, 1e-6)
+        self.reject(keep, 'aspect', (aspect >= self.min_aspect) & (aspect <= self.max_aspect))
+        
+        if self.min_edge_density > 0 and image is not None and keep.any():
+            self.reject(keep, 'edge_density', self.edge_density(image, detections) >= self.min_edge_density)
+        
+        if self.top_k is not None and np.count_nonzero(keep) > self.top_k:
+            survivors = np.flatnonzero(keep)
+            ranked = survivors[np.argsort(-detections[survivors, 4], kind='stable')]
+            passed = np.ones(len(detections), dtype=bool)
+            passed[ranked[self.top_k:]] = False
+            self.reject(keep, 'top_k', passed)
+        
+        self.kept += int(np.count_nonzero(keep))
+        return detections[keep]
+    
+    def reject(self, keep, rule, passed):
+        rejected = int(np.count_nonzero(keep & ~passed))
+        with self.lock:
+            self.rejected[rule] += rejected
+            self.pending[rule] += rejected
+        keep &= passed
+    
+    def edge_density(self, image, detections):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        scale = min(1.0, self.edge_max_side / float(max(gray.shape[:2])))
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        # Characters give a plate dense vertical strokes; bodywork, sky and
+        # road do not. One integral image scores every box at once.
+        gradient = cv2.convertScaleAbs(cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3))
+        integral = cv2.integral((gradient > self.edge_threshold).astype(np.uint8))
+        
+        height, width = gray.shape[:2]
+        boxes = np.round(detections[:, :4] * scale).astype(np.int64)
+        x1, x2 = boxes[:, 0].clip(0, width), boxes[:, 2].clip(0, width)
+        y1, y2 = boxes[:, 1].clip(0, height), boxes[:, 3].clip(0, height)
+        
+        edges = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        areas = np.maximum((x2 - x1) * (y2 - y1), 1)
+        return edges / areas
+    
+    def pop_rejections(self):
+        # Rejections since the last call, for feeding counters incrementally.
+        with self.lock:
+            pending = self.pending
+            self.pending = dict.fromkeys(FILTER_RULES, 0)
+        return pending
+    
+    def stats(self):
+        with self.lock:
+            return {'boxes': self.boxes, 'kept': self.kept, 'rejected': dict(self.rejected)}
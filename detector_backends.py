@@ -0,0 +1,203 @@
+import os
+import json
+import cv2
+import numpy as np
+
+BACKEND_EXTENSIONS = {'onnx': '.onnx', 'torchscript': '.torchscript'}
+
+# Same class offset YOLOv5 uses to keep class-aware NMS a single pass.
+MAX_WH = 7680
+
+def letterbox(image, size=640, color=(114, 114, 114)):
+    height, width = image.shape[:2]
+    ratio = min(size / float(height), size / float(width))
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    pad_x, pad_y = (size - new_width) / 2.0, (size - new_height) / 2.0
+
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return image, ratio, (left, top)
+
+def tile_origins(length, tile_size, overlap=0.2):
+    # Start offsets of tiles covering [0, length); the last tile is pinned to
+    # the far edge so no strip is left uncovered.
+    if length <= tile_size:
+        return [0]
+    step = max(1, int(tile_size * (1.0 - overlap)))
+    origins = list(range(0, length - tile_size, step))
+    origins.append(length - tile_size)
+    return origins
+
+def xywh_to_xyxy(boxes):
+    converted = np.empty_like(boxes)
+    converted[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+    converted[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+    converted[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+    converted[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+    return converted
+
+def nms(boxes, scores, iou_threshold=0.45):
+    if len(boxes) == 0:
+        return np.zeros((0,), dtype=np.int64)
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+
+    while order.size > 0:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+
+        width = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        height = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        intersection = width * height
+        iou = intersection / np.maximum(areas[best] + areas[rest] - intersection, 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+def decode_predictions(prediction, conf_threshold=0.25, iou_threshold=0.45, max_det=1000):
+    # prediction: (num_anchors, 5 + num_classes) rows of cx, cy, w, h, obj, class scores.
+    candidates = prediction[prediction[:, 4] > conf_threshold]
+    if len(candidates) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+
+    class_scores = candidates[:, 5:] * candidates[:, 4:5]
+    class_ids = class_scores.argmax(axis=1)
+    confidences = class_scores[np.arange(len(class_scores)), class_ids]
+
+    mask = confidences > conf_threshold
+    boxes = xywh_to_xyxy(candidates[mask, :4])
+    confidences, class_ids = confidences[mask], class_ids[mask]
+
+    keep = nms(boxes + class_ids[:, None] * MAX_WH, confidences, iou_threshold)[:max_det]
+    return np.concatenate([
+        boxes[keep], confidences[keep, None], class_ids[keep, None].astype(np.float32)
+    ], axis=1).astype(np.float32)
+
+def scale_detections(detections, ratio, padding, shape):
+    detections = detections.copy()
+    detections[:, [0, 2]] = (detections[:, [0, 2]] - padding[0]) / ratio
+    detections[:, [1, 3]] = (detections[:, [1, 3]] - padding[1]) / ratio
+    detections[:, [0, 2]] = detections[:, [0, 2]].clip(0, shape[1])
+    detections[:, [1, 3]] = detections[:, [1, 3]].clip(0, shape[0])
+    return detections
+
+class ExportedBackend:
+    def __init__(self, path):
+        self.path = path
+        with open(path + '.json') as f:
+            self.meta = json.load(f)
+        self.size = self.meta['size']
+        self.names = {int(key): value for key, value in self.meta['names'].items()}
+
+    def detect(self, images_rgb, conf_threshold=0.25, iou_threshold=0.45, max_det=1000):
+        letterboxed = [letterbox(image, self.size) for image in images_rgb]
+        batch = np.stack([image for image, _, _ in letterboxed]).transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+        predictions = self.forward(batch)
+
+        detections = []
+        for prediction, image, (_, ratio, padding) in zip(predictions, images_rgb, letterboxed):
+            decoded = decode_predictions(prediction, conf_threshold, iou_threshold, max_det)
+            detections.append(scale_detections(decoded, ratio, padding, image.shape))
+        return detections
+
+class OnnxBackend(ExportedBackend):
+    def __init__(self, path, num_threads=None):
+        super().__init__(path)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def forward(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+class TorchScriptBackend(ExportedBackend):
+    def __init__(self, path, num_threads=None):
+        super().__init__(path)
+        import torch
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.module = torch.jit.optimize_for_inference(torch.jit.load(path, map_location='cpu').eval())
+
+    def forward(self, batch):
+        with self.torch.inference_mode():
+            output = self.module(self.torch.from_numpy(batch))
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        return output.numpy()
+
+BACKENDS = {'onnx': OnnxBackend, 'torchscript': TorchScriptBackend}
+
+def default_backend_path(backend, model_path=None, int8=False, directory='models'):
+    stem = os.path.splitext(os.path.basename(model_path))[0] if model_path else 'yolov5s'
+    suffix = '_int8' if int8 else ''
+    return os.path.join(directory, f"{stem}{suffix}{BACKEND_EXTENSIONS[backend]}")
+
+def export_backend(hub_model, backend, path, size=640, int8=False):
+    import torch
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend}")
+    if int8 and backend != 'onnx':
+        raise ValueError("INT8 quantization is only available for the onnx backend")
+
+    # hub_model is the AutoShape wrapper; .model is DetectMultiBackend and its
+    # .model the plain DetectionModel, which is what gets exported.
+    raw_model = hub_model.model.model if hasattr(hub_model.model, 'model') else hub_model.model
+    raw_model = raw_model.float().cpu().eval()
+    for module in raw_model.modules():
+        if hasattr(module, 'export'):
+            module.export = True
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    dummy = torch.zeros(1, 3, size, size)
+    if backend == 'onnx':
+        float_path = path + '.fp32.onnx' if int8 else path
+        torch.onnx.export(
+            raw_model, dummy, float_path, opset_version=12,
+            input_names=['images'], output_names=['output'],
+            dynamic_axes={'images': {0: 'batch'}, 'output': {0: 'batch'}}
+        )
+        if int8:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(float_path, path, weight_type=QuantType.QInt8)
+            os.remove(float_path)
+    else:
+        with torch.no_grad():
+            traced = torch.jit.trace(raw_model, dummy, strict=False)
+        traced.save(path)
+
+    for module in raw_model.modules():
+        if hasattr(module, 'export'):
+            module.export = False
+
+    names = hub_model.names if isinstance(hub_model.names, dict) else dict(enumerate(hub_model.names))
+    with open(path + '.json', 'w') as f:
+        json.dump({'size': size, 'names': {str(key): value for key, value in names.items()},
+                   'int8': int8}, f, indent=2)
+
+    print(f"Exported {backend} detector: {path}")
+    return path
+
+def load_backend(backend, path, num_threads=None):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend}")
+    return BACKENDS[backend](path, num_threads=num_threads)
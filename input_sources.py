@@ -0,0 +1,78 @@
+import os
+import json
+import zlib
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+
+def parse_shard(spec):
+    # "i/N" with 0 <= i < N, e.g. "0/4" .. "3/4".
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got: {spec}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be in [0, {count}), got: {spec}")
+    return index, count
+
+def in_shard(name, shard):
+    # crc32 of the relative name is stable across machines and Python runs,
+    # so N nodes split the same archive with no overlap and no coordinator.
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(name.encode('utf-8')) % count == index
+
+def scan_directory(root, recursive=False, extensions=IMAGE_EXTENSIONS):
+    # Streams (relative name, path) in a fixed order: a directory's files by
+    # name, then its subdirectories by name, depth first. Only one directory
+    # listing is held at a time, and os.scandir's cached entry types avoid a
+    # stat per file.
+    directories = [(root, '')]
+    while directories:
+        directory, prefix = directories.pop()
+        with os.scandir(directory) as scanner:
+            entries = sorted(scanner, key=lambda entry: entry.name)
+        
+        subdirectories = []
+        for entry in entries:
+            # Symlinked directories are not followed, so a link loop cannot
+            # make a recursive scan run forever.
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirectories.append((entry.path, prefix + entry.name + '/'))
+            elif entry.name.lower().endswith(extensions):
+                yield prefix + entry.name, entry.path
+        
+        # Reversed onto the stack so subdirectories are visited in sorted order.
+        directories.extend(reversed(subdirectories))
+
+def read_manifest(manifest_path, extensions=IMAGE_EXTENSIONS):
+    # One path per line, or JSONL objects with a "path" key. Relative paths
+    # are resolved against the manifest's directory; order is kept as written.
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = json.loads(line)['path'] if line.startswith('{') else line
+            if not path.lower().endswith(extensions):
+                continue
+            name = path.replace(os.sep, '/')
+            yield name, path if os.path.isabs(path) else os.path.join(base, path)
+
+def iter_inputs(source, recursive=False, shard=None, extensions=IMAGE_EXTENSIONS):
+    # source is a directory or a manifest file; shard is (i, N) or "i/N".
+    if isinstance(shard, str):
+        shard = parse_shard(shard)
+    
+    if os.path.isdir(source):
+        items = scan_directory(source, recursive, extensions)
+    elif os.path.isfile(source):
+        items = read_manifest(source, extensions)
+    else:
+        raise ValueError(f"Input not found: {source}")
+    
+    # Validated above rather than inside a generator, so a bad source fails
+    # here and not later on a pipeline worker thread.
+    return ((name, path) for name, path in items if in_shard(name, shard))
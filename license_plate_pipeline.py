@@ -1,42 +1,307 @@
 import os
 import cv2
 import json
+import time
 from datetime import datetime
 from detect_plate_yolo_enhanced import LicensePlateDetector
 from ocr_plate_enhanced import LicensePlateOCR
+from staged_pipeline import StagedBatchRunner, run_ocr, crop_error
+from plate_tracker import PlateTracker
+from result_cache import ResultCache
+from result_log import ResultLog
+from input_sources import iter_inputs
+from plate_hotlist import PlateHotlist
+from watch_folder import create_watcher
+from resource_config import ResourceConfig
+from artifact_writer import ArtifactWriter
+from pipeline_metrics import PipelineMetrics, timed
 
 class LicensePlatePipeline:
-    def __init__(self, model_path=None, confidence_threshold=0.05):
-        self.detector = LicensePlateDetector(model_path, confidence_threshold)
-        self.ocr = LicensePlateOCR()
+    def __init__(self, model_path=None, confidence_threshold=0.05, batch_size=8, in_memory_crops=False,
+                 batch_ocr=False, ocr_mode='detect', decode_workers=4, ocr_workers=0, queue_depth=16,
+                 use_cache=False, cache_path=None, cache_max_entries=None, cache_max_bytes=None,
+                 model_dir=None, offline=False, serialized_model=None, headless=False, artifact_format='jpeg',
+                 jpeg_quality=95, annotate_frames=False, artifact_queue_size=64, detector_backend='torch',
+                 detector_backend_path=None, detector_int8=False, metrics=None, metrics_port=None,
+                 metrics_file=None, ocr_policy='both', ocr_cascade_threshold=0.8, detection_filter=None,
+                 detect_max_side=None, tile_size=None, tile_overlap=0.2, decode_reduction=1, hotlist=None,
+                 resources=None, views_per_pass=8):
+        if batch_ocr and ocr_mode == 'detect':
+            # Batched OCR hands known text regions straight to the recognizer,
+            # which is what recognize mode does; in detect mode it would read
+            # every crop on its own anyway.
+            raise ValueError("batch_ocr=True needs ocr_mode='recognize'")
+        # Thread pools and affinity are set before any model is loaded; a
+        # saved layout (e.g. from resource_config.py autotune) can be passed
+        # as a path.
+        if isinstance(resources, str):
+            resources = ResourceConfig.load(resources)
+        self.resources = resources
+        if resources is not None:
+            resources.apply()
+            if resources.ocr_workers is not None:
+                ocr_workers = resources.ocr_workers
+        
+        start = time.perf_counter()
+        self.detector = LicensePlateDetector(model_path, confidence_threshold, model_dir=model_dir,
+                                             offline=offline, serialized_path=serialized_model,
+                                             backend=detector_backend, backend_path=detector_backend_path,
+                                             int8=detector_int8, detection_filter=detection_filter,
+                                             backend_threads=resources.torch_threads if resources else None,
+                                             detect_max_side=detect_max_side, tile_size=tile_size,
+                                             tile_overlap=tile_overlap, decode_reduction=decode_reduction,
+                                             views_per_pass=views_per_pass)
+        detector_time = time.perf_counter() - start
+        self.model_path = model_path
+        self.confidence_threshold = confidence_threshold
+        self.ocr_options = {'mode': ocr_mode, 'policy': ocr_policy, 'cascade_threshold': ocr_cascade_threshold}
+        if model_dir:
+            self.ocr_options['model_storage_directory'] = os.path.join(model_dir, 'easyocr')
+        if offline:
+            self.ocr_options['download_enabled'] = False
+        
+        start = time.perf_counter()
+        self.ocr = LicensePlateOCR(**self.ocr_options)
+        ocr_time = time.perf_counter() - start
+        
+        self.startup_timings = dict(self.detector.startup_timings)
+        self.startup_timings.update(self.ocr.startup_timings)
+        self.startup_timings['detector_total'] = detector_time
+        self.startup_timings['ocr_total'] = ocr_time
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers
+        self.ocr_workers = ocr_workers
+        self.queue_depth = queue_depth
+        self.headless = headless
+        self.in_memory_crops = in_memory_crops or headless
+        self.batch_ocr = batch_ocr
+        # In-memory and headless modes hand crops to OCR as views of the
+        # decoded frame, so every artifact can be written from a background
+        # thread. Otherwise OCR reads the crop files back and writes stay
+        # synchronous.
+        self.artifact_writer = ArtifactWriter(
+            image_format=artifact_format,
+            jpeg_quality=jpeg_quality,
+            annotate_frames=annotate_frames,
+            max_queue=artifact_queue_size,
+            background=self.in_memory_crops
+        )
+        self.use_cache = use_cache
+        self.cache_path = cache_path
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_bytes = cache_max_bytes
+        self.cache = None
+        self.hotlist = hotlist
+        self.metrics = metrics or PipelineMetrics()
+        self.metrics_file = metrics_file
+        if metrics_port is not None:
+            self.metrics.start_http_server(metrics_port)
+    
+    def startup_report(self):
+        print("Startup time breakdown:")
+        for stage, seconds in self.startup_timings.items():
+            print(f"  {stage}: {seconds:.2f}s")
+        print(f"  total: {self.startup_timings['detector_total'] + self.startup_timings['ocr_total']:.2f}s")
+        return self.startup_timings
+    
+    def add_metrics_hook(self, hook):
+        return self.metrics.add_hook(hook)
+    
+    def record_metrics(self, results):
+        self.metrics.observe_timings(results.get('timings', {}))
+        self.metrics.increment('images')
+        self.metrics.increment('plates', results['detected_plates'])
+        if results.get('cached'):
+            self.metrics.increment('cache_hits')
+        if self.hotlist is not None:
+            hits = sum(1 for plate in results['plates'] if plate.get('hotlist_matches'))
+            self.metrics.increment('hotlist_hits', hits)
+        if self.detector.detection_filter is not None:
+            for rule, count in self.detector.detection_filter.pop_rejections().items():
+                if count:
+                    self.metrics.increment(f'detections_rejected_{rule}', count)
+    
+    def export_metrics(self):
+        if self.metrics_file:
+            self.metrics.write_prometheus(self.metrics_file)
+    
+    def close(self):
+        self.artifact_writer.close()
+        self.export_metrics()
+        self.metrics.stop_http_server()
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+    
+    def cache_config(self):
+        # Anything that can change the plates for the same image bytes.
+        return {
+            'model_path': self.model_path,
+            'model_mtime': os.path.getmtime(self.model_path) if self.model_path and os.path.exists(self.model_path) else None,
+            'confidence_threshold': self.confidence_threshold,
+            'detector_backend': self.detector.backend_name,
+            'detector_backend_path': self.detector.backend.path if self.detector.backend else None,
+            'ocr_options': self.ocr_options,
+            'batch_ocr': self.batch_ocr,
+            'detection_filter': self.detector.detection_filter.config() if self.detector.detection_filter else None,
+            'resolution': self.detector.resolution_config()
+        }
+    
+    def get_cache(self, output_dir):
+        if not self.use_cache:
+            return None
+        
+        path = self.cache_path or os.path.join(output_dir, "result_cache.sqlite")
+        if self.cache is None or self.cache.path != path:
+            if self.cache is not None:
+                self.cache.close()
+            self.cache = ResultCache(path, max_entries=self.cache_max_entries, max_bytes=self.cache_max_bytes)
+        return self.cache
+    
+    def load_cached(self, image_path, cache):
+        with open(image_path, 'rb') as f:
+            image_bytes = f.read()
+        
+        cache_key = cache.make_key(image_bytes, self.cache_config())
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return None, cache_key, cached
+        
+        # The bytes are already in memory, so decode them instead of reading
+        # the file a second time.
+        image = self.detector.decode_bytes(image_bytes)
+        if image is None:
+            raise ValueError(f"Could not load image from {image_path}")
+        return image, cache_key, None
+    
+    def store_cached(self, cache, cache_key, results):
+        cache.put(cache_key, {
+            'detected_plates': results['detected_plates'],
+            'plates': self.json_plates(results)
+        })
+    
+    def replay_cached(self, image_path, cached, timestamp, result_dir, save_intermediates=True, timings=None):
+        results = {
+            'input_image': image_path,
+            'timestamp': timestamp,
+            'detected_plates': cached['detected_plates'],
+            'plates': cached['plates'],
+            'cached': True
+        }
+        if timings is not None:
+            results['timings'] = timings
+        
+        # The hotlist can change between runs, so cached reads are matched again.
+        self.match_hotlist(results['plates'], timings)
+        
+        if save_intermediates:
+            with timed(timings, 'artifact_write'):
+                self.write_results(results, result_dir)
+        
+        return results
+    
+    def match_hotlist(self, plates, timings=None):
+        if self.hotlist is None:
+            return
+        with timed(timings, 'hotlist_match'):
+            for plate in plates:
+                text = plate.get('recognized_text')
+                plate['hotlist_matches'] = self.hotlist.lookup(text) if text else []
+        for plate in plates:
+            for match in plate['hotlist_matches']:
+                print(f"  HOTLIST: '{plate['recognized_text']}' matches '{match['plate']}' "
+                      f"(distance: {match['distance']:.2f}, label: {match['label']})")
+    
+    def json_plates(self, results):
+        return [
+            {key: value for key, value in plate.items() if key != 'all_ocr_results'}
+            for plate in results['plates']
+        ]
+    
+    def write_results(self, results, result_dir):
+        results_file = os.path.join(result_dir, "results.json")
+        json_results = results.copy()
+        json_results['plates'] = self.json_plates(results)
+        if 'timings' in results:
+            json_results['timings'] = dict(results['timings'])
+        self.artifact_writer.save_json(json_results, results_file)
+        print(f"Results saved to: {results_file}")
+    
+    def save_crops(self, detected_plates, crop_dir):
+        self.artifact_writer.save_crops(detected_plates, crop_dir)
         
     def process_image(self, image_path, output_dir="results", save_intermediates=True):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         result_dir = os.path.join(output_dir, f"result_{timestamp}")
         os.makedirs(result_dir, exist_ok=True)
         
+        timings = {}
+        image = image_path
+        # The cache is keyed on file bytes, so in-memory frames skip it. A
+        # miss decodes the bytes it has already read, and a hit needs no
+        # pixels at all.
+        cache = self.get_cache(output_dir) if isinstance(image_path, str) else None
+        if cache is None and save_intermediates and self.artifact_writer.annotate_frames:
+            with timed(timings, 'decode'):
+                image = self.detector.load_image(image_path)
+        
+        if cache is not None:
+            with timed(timings, 'cache_lookup'):
+                image, cache_key, cached = self.load_cached(image_path, cache)
+            if cached is not None:
+                print("Using cached result")
+                results = self.replay_cached(image_path, cached, timestamp, result_dir, save_intermediates,
+                                             timings=timings)
+                self.record_metrics(results)
+                return results
+        
         print("Step 1: Detecting license plates...")
         detected_plates = self.detector.detect_plates(
-            image_path, 
-            save_crops=save_intermediates,
-            output_dir=os.path.join(result_dir, "detected_plates")
+            image, 
+            save_crops=False,
+            display=not self.headless,
+            timings=timings
         )
         
+        if save_intermediates:
+            with timed(timings, 'artifact_write'):
+                self.save_crops(detected_plates, os.path.join(result_dir, "detected_plates"))
+        
         print("Step 2: Performing OCR...")
+        results = self.recognize_plates(image_path, detected_plates, timestamp, result_dir, save_intermediates,
+                                        image=image, timings=timings)
+        
+        if cache is not None:
+            with timed(timings, 'cache_store'):
+                self.store_cached(cache, cache_key, results)
+        
+        self.record_metrics(results)
+        return results
+    
+    def recognize_plates(self, image_path, detected_plates, timestamp, result_dir, save_intermediates=True,
+                         ocr_results=None, image=None, timings=None):
+        if ocr_results is None and self.batch_ocr:
+            ocr_results = self.ocr.extract_text_batch([plate['cropped_image'] for plate in detected_plates],
+                                                      timings=timings)
+        
         results = {
             'input_image': image_path,
             'timestamp': timestamp,
             'detected_plates': len(detected_plates),
             'plates': []
         }
+        if timings is not None:
+            results['timings'] = timings
         
         for idx, plate_info in enumerate(detected_plates):
             print(f"Processing plate {idx + 1}/{len(detected_plates)}")
             
-            if plate_info['image_path']:
-                ocr_result = self.ocr.extract_text_from_image(plate_info['image_path'])
+            if ocr_results is not None:
+                ocr_result = ocr_results[idx]
+            elif plate_info['image_path'] and not self.in_memory_crops:
+                ocr_result = self.ocr.extract_text_from_image(plate_info['image_path'], timings=timings)
             else:
-                ocr_result = self.ocr.extract_text_from_image(plate_info['cropped_image'])
+                ocr_result = self.ocr.extract_text_from_image(plate_info['cropped_image'], timings=timings)
             
             plate_result = {
                 'plate_id': idx,
@@ -44,6 +309,7 @@ class LicensePlatePipeline:
                 'bbox': plate_info['bbox'],
                 'recognized_text': ocr_result['best_text'],
                 'ocr_confidence': float(ocr_result['confidence']),
+                'ocr_pass': ocr_result.get('winning_pass'),
                 'cropped_image_path': plate_info['image_path'],
                 'all_ocr_results': ocr_result
             }
@@ -51,46 +317,180 @@ class LicensePlatePipeline:
             results['plates'].append(plate_result)
             print(f"  Detected text: '{ocr_result['best_text']}' (confidence: {ocr_result['confidence']:.2f})")
         
+        self.match_hotlist(results['plates'], timings)
+        
         if save_intermediates:
-            results_file = os.path.join(result_dir, "results.json")
-            with open(results_file, 'w') as f:
-                json_results = results.copy()
-                for plate in json_results['plates']:
-                    if 'all_ocr_results' in plate:
-                        del plate['all_ocr_results']
-                json.dump(json_results, f, indent=2)
-            print(f"Results saved to: {results_file}")
+            with timed(timings, 'artifact_write'):
+                if not isinstance(image, str):
+                    annotated_path = self.artifact_writer.save_annotated(image, results['plates'], result_dir)
+                    if annotated_path:
+                        results['annotated_image_path'] = annotated_path
+                self.write_results(results, result_dir)
         
         return results
     
-    def process_batch(self, input_directory, output_dir="batch_results"):
+    def process_frames(self, images, names=None):
+        # In-memory batch entry point: decoded BGR frames in, results out,
+        # nothing written to disk. Used by the HTTP service's micro-batches.
+        # A frame whose crop fails OCR gets an {'error': ...} entry; the other
+        # frames of the batch are unaffected.
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        names = names or [None] * len(images)
+        timings = [{} for _ in images]
+        
+        batch_plates = self.detector.detect_plates_batch(images, batch_size=max(1, len(images)), timings=timings)
+        
+        crops = [plate['cropped_image'] for detected_plates in batch_plates for plate in detected_plates]
+        flat_results, ocr_timings = run_ocr(self.ocr, crops, self.batch_ocr)
+        
+        all_results = []
+        offset = 0
+        for name, detected_plates, image_timings in zip(names, batch_plates, timings):
+            share = len(detected_plates) / float(len(crops)) if crops else 0.0
+            for stage, seconds in ocr_timings.items():
+                image_timings[stage] = image_timings.get(stage, 0.0) + seconds * share
+            
+            ocr_results = flat_results[offset:offset + len(detected_plates)]
+            offset += len(detected_plates)
+            error = crop_error(ocr_results)
+            if error is not None:
+                self.metrics.increment('errors')
+                all_results.append({'input_image': name, 'error': str(error)})
+                continue
+            
+            results = self.recognize_plates(name, detected_plates, timestamp, None, save_intermediates=False,
+                                            ocr_results=ocr_results, timings=image_timings)
+            self.record_metrics(results)
+            all_results.append(results)
+        
+        return all_results
+    
+    def create_runner(self, batch_size=None, decode_workers=None, ocr_workers=None, queue_depth=None):
+        return StagedBatchRunner(
+            self,
+            decode_workers=decode_workers or self.decode_workers,
+            ocr_workers=self.ocr_workers if ocr_workers is None else ocr_workers,
+            queue_depth=queue_depth or self.queue_depth,
+            batch_size=batch_size or self.batch_size
+        )
+    
+    def run_batch(self, items, batch_output_dir, timestamp, batch_size=None, decode_workers=None,
+                  ocr_workers=None, queue_depth=None, cache=None, runner=None):
+        # A runner that was start()ed keeps its OCR workers across calls.
+        runner = runner or self.create_runner(batch_size, decode_workers, ocr_workers, queue_depth)
+        
+        for count, result in enumerate(runner.run(items, batch_output_dir, timestamp, cache=cache), 1):
+            filename = result['filename']
+            if 'error' in result:
+                self.metrics.increment('errors')
+                print(f"Error processing {filename}: {result['error']}")
+            else:
+                self.record_metrics(result)
+                print(f"Found {result['detected_plates']} plates in {filename}")
+                for plate in result['plates']:
+                    print(f"  - '{plate['recognized_text']}' (confidence: {plate['ocr_confidence']:.2f})")
+            if count % 100 == 0:
+                self.export_metrics()
+            yield result
+    
+    def finish_batch(self, cache):
+        self.artifact_writer.flush()
+        self.export_metrics()
+        
+        if cache is not None:
+            stats = cache.stats()
+            print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"{stats['entries']} entries, {stats['evictions']} evicted")
+        
+        if self.detector.detection_filter is not None:
+            stats = self.detector.detection_filter.stats()
+            rejected = ', '.join(f"{rule}: {count}" for rule, count in stats['rejected'].items())
+            print(f"Detection filter: kept {stats['kept']} of {stats['boxes']} boxes ({rejected})")
+    
+    def log_entry(self, result):
+        if 'error' in result:
+            return {'filename': result['filename'], 'input_image': result['input_image'], 'error': result['error']}
+        return {
+            'filename': result['filename'],
+            'input_image': result['input_image'],
+            'timestamp': result['timestamp'],
+            'detected_plates': result['detected_plates'],
+            'cached': bool(result.get('cached')),
+            'plates': self.json_plates(result),
+            'timings': result.get('timings', {})
+        }
+    
+    def iter_batch(self, input_directory, output_dir="batch_results", results_file=None, resume=True,
+                   flush_every=50, batch_size=None, decode_workers=None, ocr_workers=None, queue_depth=None,
+                   recursive=False, shard=None):
+        # Yields results as they complete and appends each one to a JSONL log;
+        # nothing is kept in memory, and a rerun continues after the last
+        # entry the log holds.
+        log = ResultLog(results_file or os.path.join(output_dir, "results.jsonl"), flush_every, resume)
+        items = log.remaining(iter_inputs(input_directory, recursive, shard))
+        if log.attempted:
+            print(f"Resuming after {log.completed} completed images, retrying {len(log.failed)} that failed")
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        cache = self.get_cache(output_dir)
+        try:
+            for result in self.run_batch(items, output_dir, timestamp, batch_size, decode_workers, ocr_workers,
+                                         queue_depth, cache):
+                log.append(self.log_entry(result))
+                yield result
+        finally:
+            log.close()
+            self.finish_batch(cache)
+            print(f"Results appended to: {log.path}")
+    
+    def watch(self, directories, output_dir="watch_results", results_file=None, poll_interval=1.0,
+              settle_time=1.0, use_inotify=True, process_existing=False, batch_size=None):
+        # Long-running ingest: models stay loaded and every file is processed
+        # as soon as it is complete. Yields results and appends them to a
+        # JSONL log that is flushed after every entry.
+        if isinstance(directories, str):
+            directories = [directories]
+        watcher = create_watcher(directories, use_inotify, process_existing, settle_time)
+        # Names are relative to the folders' common parent, so the same file
+        # name arriving in two watched folders gets two names ("cam1/x.jpg").
+        root = os.path.commonpath([os.path.abspath(directory) for directory in directories])
+        log = ResultLog(results_file or os.path.join(output_dir, "results.jsonl"), flush_every=1)
+        cache = self.get_cache(output_dir)
+        print(f"Watching {', '.join(directories)} with {type(watcher).__name__}")
+        
+        try:
+            while True:
+                paths = watcher.wait(poll_interval)
+                if not paths:
+                    continue
+                
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                items = [(os.path.relpath(path, root).replace(os.sep, '/'), path) for path in paths]
+                # OCR stays in-process: a worker pool started per batch would
+                # reload the OCR models every time.
+                for result in self.run_batch(items, output_dir, timestamp, batch_size, ocr_workers=0, cache=cache):
+                    log.append(self.log_entry(result))
+                    yield result
+                self.export_metrics()
+        finally:
+            watcher.close()
+            log.close()
+            self.finish_batch(cache)
+    
+    def process_batch(self, input_directory, output_dir="batch_results", batch_size=None,
+                      decode_workers=None, ocr_workers=None, queue_depth=None, recursive=False, shard=None):
         all_results = []
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         batch_output_dir = os.path.join(output_dir, f"batch_{timestamp}")
         os.makedirs(batch_output_dir, exist_ok=True)
         
-        for filename in os.listdir(input_directory):
-            if any(filename.lower().endswith(ext) for ext in image_extensions):
-                image_path = os.path.join(input_directory, filename)
-                print(f"\nProcessing: {filename}")
-                
-                try:
-                    result = self.process_image(
-                        image_path,
-                        output_dir=batch_output_dir,
-                        save_intermediates=True
-                    )
-                    result['filename'] = filename
-                    all_results.append(result)
-                    
-                    print(f"Found {result['detected_plates']} plates in {filename}")
-                    for plate in result['plates']:
-                        print(f"  - '{plate['recognized_text']}' (confidence: {plate['ocr_confidence']:.2f})")
-                        
-                except Exception as e:
-                    print(f"Error processing {filename}: {str(e)}")
+        cache = self.get_cache(output_dir)
+        items = iter_inputs(input_directory, recursive, shard)
+        for result in self.run_batch(items, batch_output_dir, timestamp, batch_size, decode_workers, ocr_workers,
+                                     queue_depth, cache):
+            if 'error' not in result:
+                all_results.append(result)
         
         summary_file = os.path.join(batch_output_dir, "batch_summary.json")
         with open(summary_file, 'w') as f:
@@ -112,8 +512,75 @@ class LicensePlatePipeline:
             
             json.dump(summary, f, indent=2)
         
+        self.finish_batch(cache)
+        
         print(f"\nBatch processing complete. Results saved to: {batch_output_dir}")
         return all_results
+    
+    def process_video(self, source, detection_stride=5, output_dir="video_results", max_frames=None,
+                      iou_threshold=0.3, max_age=30, reocr_gain=1.25):
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video source {source}")
+        
+        tracker = PlateTracker(iou_threshold=iou_threshold, max_age=max_age * detection_stride,
+                               reocr_gain=reocr_gain)
+        tracks = []
+        frame_idx = -1
+        
+        try:
+            while max_frames is None or frame_idx + 1 < max_frames:
+                frame_idx += 1
+                
+                # Skipped frames are only grabbed, never decoded.
+                if frame_idx % detection_stride != 0:
+                    if not capture.grab():
+                        break
+                    continue
+                
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                
+                timings = {}
+                detected_plates = self.detector.detect_plates(frame, save_crops=False, display=False,
+                                                              timings=timings)
+                with timed(timings, 'tracking'):
+                    needs_ocr = tracker.update(detected_plates, frame_idx)
+                
+                if needs_ocr:
+                    crops = [plate['cropped_image'] for _, plate in needs_ocr]
+                    if self.batch_ocr:
+                        ocr_results = self.ocr.extract_text_batch(crops, timings=timings)
+                    else:
+                        ocr_results = [self.ocr.extract_text_from_image(crop, timings=timings) for crop in crops]
+                    for (track, _), ocr_result in zip(needs_ocr, ocr_results):
+                        track.add_read(ocr_result, frame_idx)
+                
+                self.metrics.observe_timings(timings)
+                self.metrics.increment('video_frames')
+                
+                for track in tracker.expire(frame_idx):
+                    tracks.append(track)
+                    print(f"Track {track['track_id']}: '{track['recognized_text']}' "
+                          f"(confidence: {track['ocr_confidence']:.2f}, reads: {track['ocr_reads']})")
+        finally:
+            capture.release()
+        
+        tracks.extend(tracker.flush())
+        self.match_hotlist(tracks)
+        
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        tracks_file = os.path.join(output_dir, f"tracks_{timestamp}.json")
+        with open(tracks_file, 'w') as f:
+            json.dump({'source': str(source), 'frames': frame_idx + 1, 'tracks': tracks}, f, indent=2)
+        
+        print(f"Video processing complete. {len(tracks)} plate tracks saved to: {tracks_file}")
+        return tracks
 
 """if __name__ == "__main__":
     pipeline = LicensePlatePipeline()
@@ -134,13 +601,38 @@ class LicensePlatePipeline:
         batch_results = pipeline.process_batch("examples")
         print(f"Processed {len(batch_results)} images in batch")"""
 if __name__ == "__main__":
-    pipeline = LicensePlatePipeline()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Detect and read license plates in a directory or manifest")
+    parser.add_argument("input", nargs="?", default="examples", help="Image directory or manifest file")
+    parser.add_argument("--output", default="batch_results")
+    parser.add_argument("--recursive", action="store_true")
+    parser.add_argument("--shard", default=None, help="i/N: process only shard i of N (0-based)")
+    parser.add_argument("--stream", action="store_true", help="Stream results to a resumable results.jsonl")
+    parser.add_argument("--hotlist", default=None, help="File of watched plates, one per line (PLATE[,label])")
+    parser.add_argument("--watch", action="store_true", help="Keep running and process new files in the input directory")
+    parser.add_argument("--poll", action="store_true", help="Poll instead of using inotify (e.g. for network shares)")
+    args = parser.parse_args()
+    
+    hotlist = PlateHotlist.from_file(args.hotlist) if args.hotlist else None
+    pipeline = LicensePlatePipeline(hotlist=hotlist)
     
-    input_directory = "examples"  
+    input_directory = args.input
     
-    if os.path.exists(input_directory):
+    if args.watch:
+        try:
+            for _ in pipeline.watch(input_directory, args.output, use_inotify=not args.poll):
+                pass
+        except KeyboardInterrupt:
+            pass
+    elif args.stream:
+        processed = sum(1 for _ in pipeline.iter_batch(input_directory, args.output, recursive=args.recursive,
+                                                       shard=args.shard))
+        print(f"Processed {processed} images")
+    elif os.path.exists(input_directory):
         print("Processing multiple car images...")
-        batch_results = pipeline.process_batch(input_directory)
+        batch_results = pipeline.process_batch(input_directory, args.output, recursive=args.recursive,
+                                               shard=args.shard)
         
         print(f"\n=== SUMMARY ===")
         print(f"Processed {len(batch_results)} car images")
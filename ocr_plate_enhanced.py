@@ -1,14 +1,47 @@
 import cv2
-import easyocr
 import numpy as np
-import matplotlib.pyplot as plt
 import re
 import os
+import time
+from pipeline_metrics import timed
+from input_sources import iter_inputs
 from typing import List, Tuple, Dict
 
+# Fractions of the crop height read as separate lines on two-line plates.
+TWO_LINE_BANDS = ((0.0, 0.55), (0.45, 1.0))
+
+# Cascade passes, cheapest first. 'processed' is the bilateral/adaptive
+# threshold variant from preprocess_image.
+CASCADE_PASSES = ('original', 'clahe_otsu', 'processed', 'inverted')
+
 class LicensePlateOCR:
-    def __init__(self, languages=['en'], gpu=False):
-        self.reader = easyocr.Reader(languages, gpu=gpu)
+    def __init__(self, languages=['en'], gpu=False, mode='detect', text_bands=TWO_LINE_BANDS,
+                 model_storage_directory=None, download_enabled=True, policy='both', cascade_threshold=0.8,
+                 cascade_passes=CASCADE_PASSES, normalize_height=64):
+        if mode not in ('detect', 'recognize'):
+            raise ValueError(f"Unknown OCR mode: {mode}")
+        if policy not in ('both', 'cascade'):
+            raise ValueError(f"Unknown OCR policy: {policy}")
+        for pass_name in cascade_passes:
+            if pass_name not in CASCADE_PASSES:
+                raise ValueError(f"Unknown OCR cascade pass: {pass_name}")
+        self.startup_timings = {}
+        
+        start = time.perf_counter()
+        import easyocr
+        self.startup_timings['ocr_import'] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        self.reader = easyocr.Reader(languages, gpu=gpu, model_storage_directory=model_storage_directory,
+                                     download_enabled=download_enabled)
+        self.startup_timings['ocr_reader_load'] = time.perf_counter() - start
+        self.mode = mode
+        self.text_bands = text_bands
+        self.policy = policy
+        self.cascade_threshold = cascade_threshold
+        self.cascade_passes = tuple(cascade_passes)
+        self.normalize_height = normalize_height
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
         
     def preprocess_image(self, image):
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -24,6 +57,40 @@ class LicensePlateOCR:
         
         return processed
     
+    def fast_preprocess(self, image):
+        gray = self.to_gray(image)
+        equalized = self.clahe.apply(gray)
+        _, thresh = cv2.threshold(equalized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return thresh
+    
+    def to_gray(self, image):
+        if image.ndim == 2:
+            return image
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    
+    def normalize_crop(self, image):
+        # Crops come in at whatever size the plate had in the frame; every
+        # cascade pass works on the same fixed text height instead.
+        height = image.shape[0]
+        if not self.normalize_height or height == 0 or height == self.normalize_height:
+            return image, 1.0
+        scale = self.normalize_height / float(height)
+        width = max(1, int(round(image.shape[1] * scale)))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        return cv2.resize(image, (width, self.normalize_height), interpolation=interpolation), scale
+    
+    def make_variant(self, image, pass_name):
+        if pass_name == 'original':
+            return image
+        if pass_name == 'clahe_otsu':
+            return self.fast_preprocess(image)
+        if pass_name == 'processed':
+            return self.preprocess_image(image)
+        if pass_name == 'inverted':
+            # Light characters on a dark plate.
+            return cv2.bitwise_not(self.to_gray(image))
+        raise ValueError(f"Unknown OCR cascade pass: {pass_name}")
+    
     def clean_text(self, text):
         cleaned = re.sub(r'[^A-Z0-9\s]', '', text.upper())
         cleaned = re.sub(r'\s+', ' ', cleaned).strip()
@@ -41,45 +108,240 @@ class LicensePlateOCR:
         
         return result
     
-    def extract_text_from_image(self, image_path, show_preprocessing=False):
+    def load_image(self, image_path):
         if isinstance(image_path, str):
             image = cv2.imread(image_path)
             if image is None:
                 raise ValueError(f"Could not load image from {image_path}")
+            return image
+        return image_path
+    
+    def extract_text_from_image(self, image_path, show_preprocessing=False, timings=None):
+        if isinstance(image_path, str):
+            with timed(timings, 'crop_decode'):
+                image = self.load_image(image_path)
         else:
-            image = image_path 
+            image = image_path
+        
+        if image.size == 0:
+            return self.build_result({})
+        if self.policy == 'cascade':
+            return self.extract_text_cascade(image, timings)
         
-        processed_image = self.preprocess_image(image)
+        with timed(timings, 'preprocess'):
+            processed_image = self.preprocess_image(image)
         
         if show_preprocessing:
             self.show_preprocessing_steps(image, processed_image)
         
-        original_results = self.reader.readtext(image)
-        processed_results = self.reader.readtext(processed_image)
+        with timed(timings, 'ocr_original'):
+            original_results = self.read_text(image)
+        with timed(timings, 'ocr_processed'):
+            processed_results = self.read_text(processed_image)
+        
+        with timed(timings, 'candidate_selection'):
+            return self.build_result({
+                'original': self.parse_ocr_results(original_results, 'original'),
+                'processed': self.parse_ocr_results(processed_results, 'processed')
+            })
+    
+    def extract_text_cascade(self, image, timings=None):
+        passes = {}
+        if image.size == 0:
+            return self.build_result(passes)
+        
+        with timed(timings, 'preprocess'):
+            image, scale = self.normalize_crop(image)
+        
+        for pass_name in self.cascade_passes:
+            with timed(timings, 'preprocess'):
+                variant = self.make_variant(image, pass_name)
+            with timed(timings, f'ocr_{pass_name}'):
+                raw_results = self.read_text(variant)
+            passes[pass_name] = self.parse_ocr_results(raw_results, pass_name, scale)
+            
+            with timed(timings, 'candidate_selection'):
+                if self.pass_score(passes) >= self.cascade_threshold:
+                    break
+        
+        with timed(timings, 'candidate_selection'):
+            return self.build_result(passes)
+    
+    def pass_score(self, passes):
+        candidates = [result for parsed in passes.values() for result in parsed]
+        return self.select_best_result(candidates, []).get('score', 0.0)
+    
+    def read_text(self, image):
+        if self.mode == 'detect':
+            return self.reader.readtext(image)
+        
+        # YOLO has already localised the plate, so the crop itself (and its
+        # line bands) are the text regions and CRAFT detection is skipped.
+        height, width = image.shape[:2]
+        if height == 0 or width == 0:
+            return []
+        regions = [[0, width, top, bottom] for top, bottom in self.text_regions(height)]
+        return self.recognize_regions(self.to_gray(image), regions, batch_size=len(regions))
+    
+    def recognize_regions(self, image_gray, regions, batch_size=32):
+        # Reader.recognize runs the recognizer one box at a time on CPU, so
+        # the regions are cut and recognized here in real batches instead.
+        from easyocr.config import imgH
+        from easyocr.recognition import get_text
+        from easyocr.utils import get_image_list
+        
+        image_list, max_width = get_image_list(regions, [], image_gray, model_height=imgH)
+        if not image_list:
+            return []
+        ignore_char = ''.join(set(self.reader.character) - set(self.reader.lang_char))
+        return get_text(self.reader.character, imgH, int(max_width), self.reader.recognizer,
+                        self.reader.converter, image_list, ignore_char, decoder='greedy',
+                        batch_size=batch_size, workers=0, device=self.reader.device)
+    
+    def text_regions(self, height):
+        regions = [(0, height)]
+        for start, end in self.text_bands:
+            band = (int(round(start * height)), int(round(end * height)))
+            if band[1] - band[0] > 1 and band not in regions:
+                regions.append(band)
+        return regions
+    
+    def extract_text_batch(self, images, text_height=64, batch_size=32, timings=None):
+        if self.mode == 'detect':
+            # Batching skips text detection, which is only right for
+            # recognize mode; detect mode still reads every crop on its own.
+            return [self.extract_text_from_image(image, timings=timings) for image in images]
+        
+        with timed(timings, 'crop_decode'):
+            images = [self.load_image(image) for image in images]
+        
+        passes = [{} for _ in images]
+        scales = [1.0] * len(images)
+        pending = [idx for idx, image in enumerate(images) if image.size > 0]
+        
+        if self.policy == 'cascade':
+            with timed(timings, 'preprocess'):
+                for idx in pending:
+                    images[idx], scales[idx] = self.normalize_crop(images[idx])
+            # One recognizer call per pass, each over only the crops that are
+            # still below the threshold.
+            rounds = [(pass_name,) for pass_name in self.cascade_passes]
+        else:
+            rounds = [('original', 'processed')]
+        
+        for round_passes in rounds:
+            if not pending:
+                break
+            
+            variants = []
+            with timed(timings, 'preprocess'):
+                for idx in pending:
+                    for pass_name in round_passes:
+                        variants.append((idx, pass_name, self.to_gray(self.make_variant(images[idx], pass_name))))
+            
+            parsed = self.recognize_variants([variant for _, _, variant in variants], text_height, batch_size,
+                                             timings)
+            for (idx, pass_name, _), variant_results in zip(variants, parsed):
+                passes[idx][pass_name] = [
+                    dict(result, pass_name=pass_name,
+                         bbox=[[x / scales[idx], y / scales[idx]] for x, y in result['bbox']])
+                    for result in variant_results
+                ]
+            
+            if self.policy == 'cascade':
+                with timed(timings, 'candidate_selection'):
+                    pending = [idx for idx in pending if self.pass_score(passes[idx]) < self.cascade_threshold]
+        
+        with timed(timings, 'candidate_selection'):
+            return [self.build_result(result) for result in passes]
+    
+    def recognize_variants(self, variants, text_height=64, batch_size=32, timings=None):
+        parsed = [[] for _ in variants]
+        if not variants:
+            return parsed
         
+        with timed(timings, 'preprocess'):
+            canvas, regions = self.stack_text_regions(variants, text_height)
+        
+        # Every crop and variant becomes one known text region on a single
+        # canvas, so the recognizer runs batch_size regions at a time instead
+        # of detector + recognizer for every variant of every plate.
+        with timed(timings, 'ocr_batch'):
+            raw_results = self.recognize_regions(canvas, [region['box'] for region in regions], batch_size)
+        
+        region_by_rows = {(region['box'][2], region['box'][3]): idx for idx, region in enumerate(regions)}
+        for bbox, text, confidence in raw_results:
+            region_idx = region_by_rows.get((int(bbox[0][1]), int(bbox[2][1])))
+            if region_idx is None:
+                continue
+            region = regions[region_idx]
+            local_bbox = [
+                [float(x) / region['scale'], float(y - region['top']) / region['scale']]
+                for x, y in bbox
+            ]
+            parsed[region['variant']].extend(self.parse_ocr_results([(local_bbox, text, confidence)]))
+        
+        return parsed
+    
+    def stack_text_regions(self, images, text_height):
+        resized = []
+        for image in images:
+            height, width = image.shape[:2]
+            scale = text_height / float(height)
+            new_width = max(1, int(round(width * scale)))
+            resized.append((cv2.resize(image, (new_width, text_height)), scale))
+        
+        canvas_width = max(image.shape[1] for image, _ in resized)
+        canvas = np.zeros((text_height * len(resized), canvas_width), dtype=np.uint8)
+        
+        regions = []
+        for idx, (image, scale) in enumerate(resized):
+            top = idx * text_height
+            canvas[top:top + text_height, :image.shape[1]] = image
+            for band_top, band_bottom in self.text_regions(text_height):
+                regions.append({
+                    'variant': idx,
+                    'box': [0, image.shape[1], top + band_top, top + band_bottom],
+                    'top': top,
+                    'scale': scale
+                })
+        
+        return canvas, regions
+    
+    def build_result(self, passes):
         all_results = {
-            'original': self.parse_ocr_results(original_results),
-            'processed': self.parse_ocr_results(processed_results),
+            'original': passes.get('original', []),
+            'processed': passes.get('processed', []),
             'best_text': None,
-            'confidence': 0.0
+            'confidence': 0.0,
+            'passes_run': list(passes),
+            'winning_pass': None
         }
+        extra_passes = {name: parsed for name, parsed in passes.items() if name not in ('original', 'processed')}
+        if extra_passes:
+            all_results['variants'] = extra_passes
         
-        best_result = self.select_best_result(all_results['original'], all_results['processed'])
+        extra_candidates = [result for parsed in extra_passes.values() for result in parsed]
+        best_result = self.select_best_result(all_results['original'], all_results['processed'] + extra_candidates)
         all_results['best_text'] = best_result['text']
         all_results['confidence'] = best_result['confidence']
+        all_results['winning_pass'] = best_result.get('pass_name')
         
         return all_results
     
-    def parse_ocr_results(self, ocr_results):
+    def parse_ocr_results(self, ocr_results, pass_name=None, scale=1.0):
         parsed_results = []
         for bbox, text, confidence in ocr_results:
             cleaned_text = self.clean_text(text)
             if len(cleaned_text) > 0:
+                if scale != 1.0:
+                    bbox = [[float(x) / scale, float(y) / scale] for x, y in bbox]
                 parsed_results.append({
                     'text': cleaned_text,
                     'confidence': confidence,
                     'bbox': bbox,
-                    'original_text': text
+                    'original_text': text,
+                    'pass_name': pass_name
                 })
         return parsed_results
     
@@ -106,13 +368,16 @@ class LicensePlateOCR:
                 'text': text,
                 'confidence': result['confidence'],
                 'score': score,
-                'original_text': result['original_text']
+                'original_text': result['original_text'],
+                'pass_name': result.get('pass_name')
             })
         
         best = max(scored_results, key=lambda x: x['score'])
         return best
     
     def show_preprocessing_steps(self, original, processed):
+        import matplotlib.pyplot as plt
+        
         fig, axes = plt.subplots(1, 2, figsize=(12, 4))
         
         axes[0].imshow(cv2.cvtColor(original, cv2.COLOR_BGR2RGB))
@@ -126,20 +391,17 @@ class LicensePlateOCR:
         plt.tight_layout()
         plt.show()
     
-    def batch_process_directory(self, directory_path, output_file=None):
+    def batch_process_directory(self, directory_path, output_file=None, recursive=False, shard=None):
         results = []
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
-        
-        for filename in os.listdir(directory_path):
-            if any(filename.lower().endswith(ext) for ext in image_extensions):
-                image_path = os.path.join(directory_path, filename)
-                try:
-                    result = self.extract_text_from_image(image_path)
-                    result['filename'] = filename
-                    results.append(result)
-                    print(f"Processed {filename}: {result['best_text']} (confidence: {result['confidence']:.2f})")
-                except Exception as e:
-                    print(f"Error processing {filename}: {str(e)}")
+        
+        for filename, image_path in iter_inputs(directory_path, recursive, shard):
+            try:
+                result = self.extract_text_from_image(image_path)
+                result['filename'] = filename
+                results.append(result)
+                print(f"Processed {filename}: {result['best_text']} (confidence: {result['confidence']:.2f})")
+            except Exception as e:
+                print(f"Error processing {filename}: {str(e)}")
         
         if output_file:
             with open(output_file, 'w') as f:
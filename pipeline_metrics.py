@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+class PipelineMetrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='plate_pipeline'):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.hooks = []
+        self.server = None
+
+    def add_hook(self, hook):
+        # hook(stage, seconds) runs for every observed stage timing.
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for idx, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram['buckets'][idx] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+        for hook in list(self.hooks):
+            try:
+                hook(stage, seconds)
+            except Exception as e:
+                print(f"Metrics hook failed: {str(e)}")
+
+    def observe_timings(self, timings):
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def prometheus_text(self):
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+
+            if self.histograms:
+                metric = f"{self.prefix}_stage_seconds"
+                lines.append(f"# HELP {metric} Time spent in each pipeline stage.")
+                lines.append(f"# TYPE {metric} histogram")
+                for stage, histogram in sorted(self.histograms.items()):
+                    for bound, count in zip(self.buckets, histogram['buckets']):
+                        lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+                    lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram["sum"]:.6f}')
+                    lines.append(f'{metric}_count{{stage="{stage}"}} {histogram["count"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        # Written atomically so a node_exporter textfile collector never sees
+        # a half-written file.
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+
+    def start_http_server(self, port=9108, host='127.0.0.1'):
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Serving metrics on http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
+
+    def stop_http_server(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
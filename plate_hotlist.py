@@ -0,0 +1,166 @@
+import re
+import sys
+import threading
+
+# The same OCR confusions clean_text lists; reading one for the other costs
+# confusion_cost instead of a full edit.
+CONFUSIONS = {'O': '0', 'I': '1', 'S': '5', 'B': '8'}
+
+_CANONICAL = str.maketrans(CONFUSIONS)
+
+def normalize_plate(text):
+    return re.sub(r'[^A-Z0-9]', '', text.upper())
+
+def canonical_plate(text):
+    # Confusable characters collapse to one form, so an index keyed on the
+    # canonical text treats those substitutions as free.
+    return normalize_plate(text).translate(_CANONICAL)
+
+def deletions(text, depth):
+    variants = {text}
+    frontier = {text}
+    for _ in range(depth):
+        frontier = {variant[:idx] + variant[idx + 1:] for variant in frontier for idx in range(len(variant))}
+        variants |= frontier
+    return variants
+
+def weighted_distance(a, b, confusion_cost=0.25, max_distance=None):
+    # Levenshtein distance where a confusable pair substitutes at confusion_cost.
+    previous = [float(idx) for idx in range(len(b) + 1)]
+    for i, char_a in enumerate(a, 1):
+        current = [float(i)]
+        canonical_a = char_a.translate(_CANONICAL)
+        for j, char_b in enumerate(b, 1):
+            if char_a == char_b:
+                substitution = 0.0
+            elif canonical_a == char_b.translate(_CANONICAL):
+                substitution = confusion_cost
+            else:
+                substitution = 1.0
+            current.append(min(previous[j] + 1.0, current[j - 1] + 1.0, previous[j - 1] + substitution))
+        if max_distance is not None and min(current) > max_distance:
+            return None
+        previous = current
+    return previous[-1]
+
+class PlateHotlist:
+    def __init__(self, plates=(), max_distance=1, confusion_cost=0.25):
+        # Symmetric deletion index: every plate is stored under all canonical
+        # variants with up to max_distance characters removed. Two strings
+        # within that edit distance always share one such variant, so a
+        # lookup is a handful of dict probes plus verifying the few hits.
+        # Buckets hold integer plate ids: a bucket with one plate is just
+        # that plate's id, shared by all its variants, and only the rare
+        # shared bucket needs a list.
+        self.max_distance = max_distance
+        self.depth = int(max_distance)
+        self.confusion_cost = confusion_cost
+        self.lock = threading.Lock()
+        self.index = {}
+        self.entries = {}
+        self.ids = {}
+        self.plates = []
+        self.free_ids = []
+        
+        for plate in plates:
+            if isinstance(plate, (tuple, list)):
+                self.add(*plate)
+            else:
+                self.add(plate)
+    
+    @classmethod
+    def from_file(cls, path, **options):
+        # One plate per line, optionally followed by ",label".
+        hotlist = cls(**options)
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                plate, _, label = line.strip().partition(',')
+                if plate and not plate.startswith('#'):
+                    hotlist.add(plate, label.strip() or None)
+        return hotlist
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __contains__(self, text):
+        return normalize_plate(text) in self.entries
+    
+    def add(self, plate, label=None):
+        plate = normalize_plate(plate)
+        if not plate:
+            return
+        with self.lock:
+            if plate not in self.entries:
+                plate = sys.intern(plate)
+                plate_id = self.new_id(plate)
+                index = self.index
+                for variant in deletions(plate.translate(_CANONICAL), self.depth):
+                    bucket = index.get(variant)
+                    if bucket is None:
+                        index[variant] = plate_id
+                    elif isinstance(bucket, list):
+                        bucket.append(plate_id)
+                    else:
+                        index[variant] = [bucket, plate_id]
+            self.entries[plate] = label
+    
+    def new_id(self, plate):
+        if self.free_ids:
+            plate_id = self.free_ids.pop()
+            self.plates[plate_id] = plate
+        else:
+            plate_id = len(self.plates)
+            self.plates.append(plate)
+        self.ids[plate] = plate_id
+        return plate_id
+    
+    def remove(self, plate):
+        plate = normalize_plate(plate)
+        with self.lock:
+            if plate not in self.entries:
+                return False
+            del self.entries[plate]
+            plate_id = self.ids.pop(plate)
+            self.plates[plate_id] = None
+            self.free_ids.append(plate_id)
+            for variant in deletions(plate.translate(_CANONICAL), self.depth):
+                bucket = self.index.get(variant)
+                if isinstance(bucket, list):
+                    bucket.remove(plate_id)
+                    if len(bucket) == 1:
+                        self.index[variant] = bucket[0]
+                elif bucket == plate_id:
+                    del self.index[variant]
+            return True
+    
+    def lookup(self, text, max_distance=None):
+        # Matches within max_distance, closest first; an exact read has
+        # distance 0.0, a read differing only by confusions a multiple of
+        # confusion_cost.
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        query = normalize_plate(text)
+        if not query:
+            return []
+        
+        with self.lock:
+            if query in self.entries and max_distance < self.confusion_cost:
+                return [{'plate': query, 'distance': 0.0, 'label': self.entries[query]}]
+            
+            candidate_ids = set()
+            for variant in deletions(query.translate(_CANONICAL), int(max_distance)):
+                bucket = self.index.get(variant)
+                if isinstance(bucket, list):
+                    candidate_ids.update(bucket)
+                elif bucket is not None:
+                    candidate_ids.add(bucket)
+            
+            matches = []
+            for plate in (self.plates[plate_id] for plate_id in candidate_ids):
+                if abs(len(plate) - len(query)) > max_distance:
+                    continue
+                distance = weighted_distance(query, plate, self.confusion_cost, max_distance)
+                if distance is not None and distance <= max_distance:
+                    matches.append({'plate': plate, 'distance': distance, 'label': self.entries[plate]})
+        
+        matches.sort(key=lambda match: (match['distance'], match['plate']))
+        return matches
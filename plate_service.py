@@ -0,0 +1,250 @@
+import json
+import asyncio
+import argparse
+from email.parser import BytesParser
+from email.policy import HTTP
+from concurrent.futures import ThreadPoolExecutor
+from result_cache import json_default
+
+STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 408: 'Request Timeout',
+    411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error',
+    503: 'Service Unavailable', 504: 'Gateway Timeout'
+}
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class MicroBatcher:
+    def __init__(self, pipeline, max_batch_size=8, max_wait_ms=10, max_queue=64):
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        # The models are not thread-safe, so every batch runs on one thread.
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, image):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((image, future))
+        except asyncio.QueueFull:
+            raise ServiceError(503, "Too many requests in flight")
+        return await future
+
+    async def collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Requests that already timed out are not worth a model pass.
+        return [(image, future) for image, future in batch if not future.done()]
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.collect()
+            if not batch:
+                continue
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.pipeline.process_frames, [image for image, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if 'error' in result:
+                    # Only the request that owns the failed frame gets a 500.
+                    future.set_exception(RuntimeError(result['error']))
+                else:
+                    future.set_result(result)
+
+class PlateService:
+    def __init__(self, pipeline, max_batch_size=8, max_wait_ms=10, max_queue=64, request_timeout=10.0,
+                 max_body_bytes=20 * 1024 * 1024):
+        self.pipeline = pipeline
+        self.batcher = MicroBatcher(pipeline, max_batch_size, max_wait_ms, max_queue)
+        self.request_timeout = request_timeout
+        self.max_body_bytes = max_body_bytes
+        self.decode_executor = ThreadPoolExecutor(max_workers=4)
+
+    async def read_request(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        request_line, _, header_block = head.decode('latin-1').partition('\r\n')
+        method, path, _ = request_line.split(' ', 2)
+        headers = {}
+        for line in header_block.split('\r\n'):
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        body = b''
+        if method == 'POST':
+            if 'content-length' not in headers:
+                raise ServiceError(411, "Content-Length is required")
+            length = int(headers['content-length'])
+            if length > self.max_body_bytes:
+                raise ServiceError(413, "Upload is too large")
+            body = await reader.readexactly(length)
+
+        return method, path.split('?')[0], headers, body
+
+    def extract_upload(self, headers, body):
+        content_type = headers.get('content-type', '')
+        if not content_type.startswith('multipart/form-data'):
+            return body
+
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body
+        )
+        for part in message.iter_parts():
+            if part.get_filename() or part.get_content_maintype() == 'image':
+                return part.get_payload(decode=True)
+        raise ServiceError(400, "No image found in the multipart upload")
+
+    def decode_image(self, data):
+        image = self.pipeline.detector.decode_bytes(data)
+        if image is None:
+            raise ServiceError(400, "Could not decode the uploaded image")
+        return image
+
+    async def handle_plates(self, headers, body):
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(self.decode_executor, self.decode_image,
+                                           self.extract_upload(headers, body))
+        try:
+            result = await asyncio.wait_for(self.batcher.submit(image), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise ServiceError(504, "Timed out waiting for the model")
+
+        return {
+            'detected_plates': result['detected_plates'],
+            'plates': self.pipeline.json_plates(result),
+            'timings': result.get('timings', {})
+        }
+
+    async def route(self, method, path, headers, body):
+        if path == '/health':
+            return 200, {'status': 'ok', 'queued': self.batcher.queue.qsize()}
+        if path == '/metrics':
+            return 200, self.pipeline.metrics.prometheus_text()
+        if path == '/plates':
+            if method != 'POST':
+                raise ServiceError(405, "Use POST with an image body")
+            return 200, await self.handle_plates(headers, body)
+        raise ServiceError(404, "Not found")
+
+    async def write_response(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload, default=json_default).encode('utf-8'), 'application/json'
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    method, path, headers, body = await asyncio.wait_for(
+                        self.read_request(reader), self.request_timeout
+                    )
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.TimeoutError:
+                    await self.write_response(writer, 408, {'error': 'Request timed out'}, False)
+                    break
+                except (ValueError, asyncio.LimitOverrunError):
+                    await self.write_response(writer, 400, {'error': 'Malformed request'}, False)
+                    break
+                except ServiceError as e:
+                    await self.write_response(writer, e.status, {'error': str(e)}, False)
+                    break
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    status, payload = await self.route(method, path, headers, body)
+                except ServiceError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host='0.0.0.0', port=8080):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Plate service listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self.decode_executor.shutdown(wait=True)
+
+if __name__ == "__main__":
+    from license_plate_pipeline import LicensePlatePipeline
+
+    parser = argparse.ArgumentParser(description="HTTP service for license plate recognition")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--options", default="{}", help="JSON dict of LicensePlatePipeline keyword arguments")
+    args = parser.parse_args()
+
+    options = json.loads(args.options)
+    options.setdefault('headless', True)
+    # Batched OCR needs recognize mode; without both, the crops of a
+    # micro-batch are still read one at a time.
+    options.setdefault('batch_ocr', True)
+    options.setdefault('ocr_mode', 'recognize')
+    service = PlateService(LicensePlatePipeline(**options), args.max_batch_size, args.max_wait_ms,
+                           args.max_queue, args.timeout)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
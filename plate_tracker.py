@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+
+def box_iou(boxes_a, boxes_b):
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return intersection / np.maximum(union, 1e-6)
+
+def crop_quality(crop):
+    if crop.size == 0:
+        return 0, 0.0
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    return crop.shape[0] * crop.shape[1], float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+class PlateTrack:
+    def __init__(self, track_id, plate, frame_idx):
+        self.track_id = track_id
+        self.bbox = plate['bbox']
+        self.first_frame = frame_idx
+        self.last_frame = frame_idx
+        self.best_area = 0
+        self.best_sharpness = 0.0
+        self.votes = {}
+        self.reads = []
+
+    def add_read(self, ocr_result, frame_idx):
+        text = ocr_result['best_text']
+        confidence = float(ocr_result['confidence'])
+        self.reads.append({'frame': frame_idx, 'text': text, 'confidence': confidence})
+        if text:
+            self.votes[text] = self.votes.get(text, 0.0) + confidence
+
+    def consolidated(self):
+        result = {
+            'track_id': self.track_id,
+            'first_frame': self.first_frame,
+            'last_frame': self.last_frame,
+            'bbox': self.bbox,
+            'recognized_text': '',
+            'ocr_confidence': 0.0,
+            'votes': dict(self.votes),
+            'ocr_reads': len(self.reads)
+        }
+
+        if self.votes:
+            text = max(self.votes, key=self.votes.get)
+            confidences = [read['confidence'] for read in self.reads if read['text'] == text]
+            result['recognized_text'] = text
+            result['ocr_confidence'] = sum(confidences) / len(confidences)
+
+        return result
+
+class PlateTracker:
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=0.5, max_age=30, reocr_gain=1.25):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_age = max_age
+        self.reocr_gain = reocr_gain
+        self.tracks = []
+        self.next_track_id = 0
+
+    def match(self, plates):
+        if not self.tracks or not plates:
+            return {}
+
+        track_boxes = np.array([track.bbox for track in self.tracks], dtype=np.float32)
+        plate_boxes = np.array([plate['bbox'] for plate in plates], dtype=np.float32)
+        iou = box_iou(track_boxes, plate_boxes)
+
+        # Boxes that no longer overlap (fast cars, skipped frames) can still
+        # match by centroid distance relative to the track's box size.
+        track_centres = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+        plate_centres = (plate_boxes[:, :2] + plate_boxes[:, 2:]) / 2
+        track_sizes = np.hypot(track_boxes[:, 2] - track_boxes[:, 0], track_boxes[:, 3] - track_boxes[:, 1])
+        distance = np.linalg.norm(track_centres[:, None, :] - plate_centres[None, :, :], axis=2)
+        relative_distance = distance / np.maximum(track_sizes[:, None], 1e-6)
+
+        score = np.where(iou >= self.iou_threshold, 1.0 + iou, 0.0)
+        score = np.where((score == 0) & (relative_distance <= self.max_centroid_distance),
+                         1.0 - relative_distance, score)
+
+        matches = {}
+        for flat_idx in np.argsort(-score, axis=None):
+            track_idx, plate_idx = (int(idx) for idx in np.unravel_index(flat_idx, score.shape))
+            if score[track_idx, plate_idx] <= 0:
+                break
+            if track_idx in matches.values() or plate_idx in matches:
+                continue
+            matches[plate_idx] = track_idx
+
+        return matches
+
+    def update(self, plates, frame_idx):
+        matches = self.match(plates)
+        needs_ocr = []
+
+        for plate_idx, plate in enumerate(plates):
+            if plate_idx in matches:
+                track = self.tracks[matches[plate_idx]]
+                track.bbox = plate['bbox']
+                track.last_frame = frame_idx
+            else:
+                track = PlateTrack(self.next_track_id, plate, frame_idx)
+                self.next_track_id += 1
+                self.tracks.append(track)
+
+            area, sharpness = crop_quality(plate['cropped_image'])
+            if area > 0 and (not track.reads
+                             or area > track.best_area * self.reocr_gain
+                             or sharpness > track.best_sharpness * self.reocr_gain):
+                track.best_area = max(track.best_area, area)
+                track.best_sharpness = max(track.best_sharpness, sharpness)
+                needs_ocr.append((track, plate))
+
+        return needs_ocr
+
+    def expire(self, frame_idx):
+        finished = [track for track in self.tracks if frame_idx - track.last_frame > self.max_age]
+        self.tracks = [track for track in self.tracks if frame_idx - track.last_frame <= self.max_age]
+        return [track.consolidated() for track in finished]
+
+    def flush(self):
+        finished = [track.consolidated() for track in self.tracks]
+        self.tracks = []
+        return finished
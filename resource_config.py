@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from input_sources import iter_inputs
+
+RESOURCE_FIELDS = ('torch_threads', 'torch_interop_threads', 'opencv_threads', 'cpus', 'ocr_workers',
+                   'ocr_worker_threads', 'ocr_worker_cpus')
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def configure_process(cpus=None, torch_threads=None, torch_interop_threads=None, opencv_threads=None):
+    # Thread pools are per process, so this runs once in the pipeline process
+    # and once in every OCR worker.
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    if opencv_threads is not None:
+        import cv2
+        cv2.setNumThreads(opencv_threads)
+    
+    import torch
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+    if torch_interop_threads:
+        try:
+            torch.set_num_interop_threads(torch_interop_threads)
+        except RuntimeError:
+            # Only allowed before the first inter-op parallel call.
+            print("Warning: torch inter-op threads were already in use and could not be changed")
+
+class ResourceConfig:
+    def __init__(self, torch_threads=None, torch_interop_threads=None, opencv_threads=None, cpus=None,
+                 ocr_workers=None, ocr_worker_threads=None, ocr_worker_cpus=None):
+        # None leaves a setting at the library default. ocr_worker_cpus is
+        # one CPU list per OCR worker process.
+        self.torch_threads = torch_threads
+        self.torch_interop_threads = torch_interop_threads
+        self.opencv_threads = opencv_threads
+        self.cpus = cpus
+        self.ocr_workers = ocr_workers
+        self.ocr_worker_threads = ocr_worker_threads
+        self.ocr_worker_cpus = ocr_worker_cpus
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: data[key] for key in RESOURCE_FIELDS if key in data})
+    
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+    
+    def to_dict(self):
+        return {key: getattr(self, key) for key in RESOURCE_FIELDS}
+    
+    def save(self, path, **extra):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(dict(self.to_dict(), **extra), f, indent=2)
+    
+    def apply(self):
+        configure_process(self.cpus, self.torch_threads, self.torch_interop_threads, self.opencv_threads)
+    
+    def describe(self):
+        text = f"torch={self.torch_threads}x{self.torch_interop_threads} cv2={self.opencv_threads}"
+        if self.cpus:
+            text += f" cpus={len(self.cpus)}"
+        if self.ocr_workers:
+            text += f" ocr_workers={self.ocr_workers}x{self.ocr_worker_threads}"
+            if self.ocr_worker_cpus:
+                text += " pinned"
+        return text
+
+def candidate_layouts(cpus=None):
+    cpus = cpus or available_cpus()
+    count = len(cpus)
+    half = max(1, count // 2)
+    layouts = [
+        ResourceConfig(torch_threads=count, torch_interop_threads=1, opencv_threads=count, ocr_workers=0),
+        ResourceConfig(torch_threads=count, torch_interop_threads=1, opencv_threads=1, ocr_workers=0),
+        ResourceConfig(torch_threads=half, torch_interop_threads=1, opencv_threads=half, ocr_workers=0)
+    ]
+    
+    # The pipeline process and each OCR worker get their own cores.
+    for workers in (1, 2, 4):
+        share = count // (workers + 1)
+        if share < 1:
+            break
+        main = cpus[:count - share * workers]
+        worker_cpus = [cpus[len(main) + idx * share:len(main) + (idx + 1) * share] for idx in range(workers)]
+        layouts.append(ResourceConfig(torch_threads=len(main), torch_interop_threads=1, opencv_threads=len(main),
+                                      cpus=main, ocr_workers=workers, ocr_worker_threads=share,
+                                      ocr_worker_cpus=worker_cpus))
+    return layouts
+
+def _benchmark_layout(config, image_paths, pipeline_options, repeats):
+    # Runs in a fresh process: thread pools and affinity cannot be reset
+    # once torch has used them.
+    from license_plate_pipeline import LicensePlatePipeline
+    
+    options = dict(pipeline_options)
+    options.setdefault('headless', True)
+    options.setdefault('artifact_format', 'none')
+    pipeline = LicensePlatePipeline(resources=ResourceConfig.from_dict(config), **options)
+    items = [(os.path.basename(path), path) for path in image_paths]
+    output_dir = tempfile.mkdtemp(prefix='autotune_')
+    runner = pipeline.create_runner()
+    
+    try:
+        # The OCR workers are spawned and load their Readers once, before
+        # the clock starts, and serve every timed run.
+        runner.start()
+        list(pipeline.run_batch(items[:2], output_dir, 'warmup', runner=runner))
+        processed = 0
+        start = time.perf_counter()
+        for _ in range(repeats):
+            processed += sum(1 for _ in pipeline.run_batch(items, output_dir, 'autotune', runner=runner))
+        return processed / (time.perf_counter() - start)
+    finally:
+        runner.close()
+        pipeline.close()
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def autotune(image_source, output='resources.json', limit=32, repeats=1, pipeline_options=None, layouts=None):
+    image_paths = [path for _, path in itertools.islice(iter_inputs(image_source), limit)]
+    if not image_paths:
+        raise ValueError(f"No images found in {image_source}")
+    
+    results = []
+    for layout in layouts or candidate_layouts():
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            try:
+                throughput = executor.submit(_benchmark_layout, layout.to_dict(), image_paths,
+                                             pipeline_options or {}, repeats).result()
+            except Exception as e:
+                print(f"{layout.describe()}: failed ({str(e)})")
+                continue
+        results.append((throughput, layout))
+        print(f"{layout.describe()}: {throughput:.2f} images/s")
+    
+    if not results:
+        raise RuntimeError("No layout completed the benchmark")
+    
+    throughput, best = max(results, key=lambda result: result[0])
+    best.save(output, images_per_second=throughput, cpu_count=len(available_cpus()))
+    print(f"Fastest layout: {best.describe()} ({throughput:.2f} images/s), saved to {output}")
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU thread and affinity configuration for the pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    tune = subparsers.add_parser("autotune", help="Benchmark thread layouts and save the fastest")
+    tune.add_argument("images", nargs="?", default="examples", help="Image directory or manifest file")
+    tune.add_argument("--output", default="resources.json")
+    tune.add_argument("--limit", type=int, default=32)
+    tune.add_argument("--repeats", type=int, default=1)
+    tune.add_argument("--options", default="{}", help="JSON dict of LicensePlatePipeline keyword arguments")
+    args = parser.parse_args()
+    
+    autotune(args.images, args.output, args.limit, args.repeats, json.loads(args.options))
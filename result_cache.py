@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+def json_default(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+class ResultCache:
+    def __init__(self, path, max_entries=None, max_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Decode threads look entries up while the writer stores them, so a
+        # single shared connection is guarded by the lock.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        self.connection.commit()
+
+        self.entries, self.total_bytes = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+
+    @staticmethod
+    def make_key(image_bytes, config):
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(config, sort_keys=True, default=json_default).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.connection.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            return json.loads(row[0])
+
+    def put(self, key, value):
+        payload = json.dumps(value, default=json_default)
+        now = time.time()
+
+        with self.lock:
+            previous = self.connection.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            if previous is not None:
+                self.entries -= 1
+                self.total_bytes -= previous[0]
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (key, payload, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self.entries += 1
+            self.total_bytes += len(payload)
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        # Least recently used entries go first until both bounds hold again.
+        while self.entries > 0 and (
+            (self.max_entries is not None and self.entries > self.max_entries)
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            excess = 1
+            if self.max_entries is not None:
+                excess = max(excess, self.entries - self.max_entries)
+            rows = self.connection.execute(
+                "SELECT key, size FROM results ORDER BY last_access LIMIT ?", (excess,)
+            ).fetchall()
+            if not rows:
+                break
+            self.connection.executemany("DELETE FROM results WHERE key = ?", [(key,) for key, _ in rows])
+            self.entries -= len(rows)
+            self.total_bytes -= sum(size for _, size in rows)
+            self.evictions += len(rows)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / float(lookups) if lookups else 0.0,
+            'entries': self.entries,
+            'bytes': self.total_bytes,
+            'evictions': self.evictions
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,108 @@
+import os
+import json
+import itertools
+from collections import deque
+from result_cache import json_default
+
+class ResultLog:
+    def __init__(self, path, flush_every=50, resume=True, fsync=True):
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync = fsync
+        self.pending = 0
+        # Input positions of the items handed out by remaining(); results
+        # come back in the same order, so append() pops them FIFO.
+        self.in_flight = deque()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        
+        self.attempted, self.last_input, self.failed = self.recover()
+        self.file = open(path, 'a', encoding='utf-8')
+    
+    @property
+    def completed(self):
+        return self.attempted - len(self.failed)
+    
+    def recover(self):
+        # Replays the complete entries and cuts off a line left half-written
+        # by a crash. Every input up to the highest logged position has been
+        # attempted; those whose latest entry is an error are retried.
+        if not os.path.exists(self.path):
+            return 0, None, set()
+        
+        attempted, last_input, failed, valid_end, offset = 0, None, set(), 0, 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                seq = entry.get('seq', attempted)
+                if seq >= attempted:
+                    attempted, last_input = seq + 1, entry.get('input_image')
+                if 'error' in entry:
+                    failed.add(entry.get('input_image'))
+                else:
+                    failed.discard(entry.get('input_image'))
+                valid_end = offset
+        
+        if valid_end < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+        return attempted, last_input, failed
+    
+    def remaining(self, items):
+        # items must come in the same deterministic order as in the run that
+        # wrote the log. The attempted prefix is skipped without being kept,
+        # except for the inputs that failed, which are retried first.
+        items = iter(items)
+        retries = []
+        for seq in range(self.attempted):
+            try:
+                item = next(items)
+            except StopIteration:
+                raise ValueError(f"Fewer inputs than logged entries in {self.path}; cannot resume")
+            if item[1] in self.failed:
+                retries.append((seq, item))
+            if seq == self.attempted - 1 and item[1] != self.last_input:
+                raise ValueError(f"Inputs do not match the entries in {self.path}; cannot resume")
+        
+        return self.track(itertools.chain(retries, enumerate(items, self.attempted)))
+    
+    def track(self, numbered):
+        for seq, item in numbered:
+            self.in_flight.append(seq)
+            yield item
+    
+    def append(self, entry):
+        seq = self.in_flight.popleft() if self.in_flight else self.attempted
+        self.attempted = max(self.attempted, seq + 1)
+        if 'error' in entry:
+            self.failed.add(entry['input_image'])
+        else:
+            self.failed.discard(entry['input_image'])
+        
+        self.file.write(json.dumps(dict(entry, seq=seq), default=json_default) + '\n')
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+    
+    def flush(self):
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.pending = 0
+    
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        self.file.close()
+        self.file = None
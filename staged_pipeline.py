@@ -0,0 +1,324 @@
+import os
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ocr_plate_enhanced import LicensePlateOCR
+from pipeline_metrics import timed
+from resource_config import configure_process
+
+_STOP = object()
+
+_worker_ocr = None
+_worker_batch_ocr = False
+_worker_barrier = None
+
+def _init_ocr_worker(ocr_options, batch_ocr, num_threads, worker_cpus=None, worker_counter=None,
+                     opencv_threads=None, barrier=None):
+    global _worker_ocr, _worker_batch_ocr, _worker_barrier
+    cpus = None
+    if worker_cpus:
+        # Workers take the CPU lists in start order; a replaced worker
+        # reuses a slot.
+        with worker_counter.get_lock():
+            cpus = worker_cpus[worker_counter.value % len(worker_cpus)]
+            worker_counter.value += 1
+    configure_process(cpus, num_threads, opencv_threads=opencv_threads)
+    _worker_ocr = LicensePlateOCR(**ocr_options)
+    _worker_batch_ocr = batch_ocr
+    _worker_barrier = barrier
+
+def _warm_up_worker():
+    # Holds this worker until every worker has taken one warm-up job, so the
+    # jobs cannot all run on whichever worker finished loading first.
+    _worker_barrier.wait()
+    return os.getpid()
+
+def _run_ocr_worker(crops):
+    return run_ocr(_worker_ocr, crops, _worker_batch_ocr)
+
+def run_ocr(ocr, crops, batch_ocr):
+    # Timings travel back with the results because worker processes cannot
+    # report into the parent's metrics. A crop that fails comes back as
+    # {'error': message}, so only the image it belongs to fails.
+    timings = {}
+    if batch_ocr:
+        try:
+            return ocr.extract_text_batch(crops, timings=timings), timings
+        except Exception:
+            # Read the crops one by one to isolate the one that failed.
+            pass
+    return [read_crop(ocr, crop, timings) for crop in crops], timings
+
+def read_crop(ocr, crop, timings):
+    try:
+        return ocr.extract_text_from_image(crop, timings=timings)
+    except Exception as e:
+        return {'error': str(e)}
+
+def crop_error(ocr_results):
+    for result in ocr_results:
+        if 'error' in result:
+            return RuntimeError(f"OCR failed on a plate crop: {result['error']}")
+    return None
+
+class StagedBatchRunner:
+    def __init__(self, pipeline, decode_workers=4, ocr_workers=0, queue_depth=16, batch_size=None,
+                 max_ocr_restarts=3):
+        self.pipeline = pipeline
+        self.decode_workers = max(1, decode_workers)
+        self.ocr_workers = ocr_workers
+        self.queue_depth = max(1, queue_depth)
+        self.batch_size = batch_size or pipeline.batch_size
+        self.max_ocr_restarts = max_ocr_restarts
+        self.stop_event = None
+        self.ocr_executor = None
+        self.ocr_restarts = 0
+        self.ocr_lock = threading.Lock()
+
+    def put(self, target_queue, item):
+        while not self.stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, source_queue):
+        while not self.stop_event.is_set():
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def create_ocr_executor(self):
+        if self.ocr_workers <= 0:
+            return ThreadPoolExecutor(max_workers=1)
+
+        # Each process keeps its own warm easyocr.Reader; spawn avoids forking
+        # a parent that already holds torch thread pools.
+        context = multiprocessing.get_context('spawn')
+        num_threads = max(1, (os.cpu_count() or 1) // self.ocr_workers)
+        worker_cpus, opencv_threads = None, None
+        resources = self.pipeline.resources
+        if resources is not None:
+            num_threads = resources.ocr_worker_threads or num_threads
+            worker_cpus = resources.ocr_worker_cpus
+            opencv_threads = resources.opencv_threads
+        return ProcessPoolExecutor(
+            max_workers=self.ocr_workers,
+            mp_context=context,
+            initializer=_init_ocr_worker,
+            initargs=(self.pipeline.ocr_options, self.pipeline.batch_ocr, num_threads, worker_cpus,
+                      context.Value('i', 0), opencv_threads, context.Barrier(self.ocr_workers))
+        )
+
+    def start(self):
+        # Starts the OCR pool ahead of run() and waits until every worker has
+        # loaded its Reader; the pool is then reused by each run() until
+        # close().
+        self.ocr_executor = self.create_ocr_executor()
+        self.ocr_restarts = 0
+        if self.ocr_workers > 0:
+            # A job only runs once its worker's initializer has finished, and
+            # no warm-up job returns before all ocr_workers hold one.
+            futures = [self.ocr_executor.submit(_warm_up_worker) for _ in range(self.ocr_workers)]
+            for future in futures:
+                future.result()
+
+    def close(self):
+        if self.ocr_executor is not None:
+            self.ocr_executor.shutdown(wait=True)
+            self.ocr_executor = None
+
+    def submit_ocr(self, crops):
+        # The job keeps its crops so it can be resubmitted if the pool breaks.
+        executor = self.ocr_executor
+        try:
+            if self.ocr_workers <= 0:
+                future = executor.submit(run_ocr, self.pipeline.ocr, crops, self.pipeline.batch_ocr)
+            else:
+                future = executor.submit(_run_ocr_worker, crops)
+        except BrokenProcessPool:
+            self.restart_ocr_executor(executor)
+            return self.submit_ocr(crops)
+        return {'crops': crops, 'future': future, 'executor': executor}
+
+    def restart_ocr_executor(self, broken):
+        # One worker dying (e.g. OOM-killed) breaks the whole process pool, so
+        # it is rebuilt, up to max_ocr_restarts times before the run aborts.
+        with self.ocr_lock:
+            if self.ocr_executor is not broken:
+                return
+            if self.ocr_restarts >= self.max_ocr_restarts:
+                raise BrokenProcessPool(f"OCR worker pool broke {self.ocr_restarts + 1} times; aborting the run")
+            self.ocr_restarts += 1
+            print(f"OCR worker pool broke, restarting it ({self.ocr_restarts}/{self.max_ocr_restarts})")
+            broken.shutdown(wait=False)
+            self.ocr_executor = self.create_ocr_executor()
+
+    def ocr_result(self, job):
+        while True:
+            try:
+                return job['future'].result()
+            except BrokenProcessPool:
+                self.restart_ocr_executor(job['executor'])
+                job.update(self.submit_ocr(job['crops']))
+
+    def decode(self, image_path, cache):
+        timings = {}
+        if cache is None:
+            with timed(timings, 'decode'):
+                return (self.pipeline.detector.load_image(image_path), None, None), timings
+        with timed(timings, 'cache_lookup'):
+            return self.pipeline.load_cached(image_path, cache), timings
+
+    def decode_stage(self, items, decode_executor, decoded_queue, cache):
+        try:
+            for seq, (filename, image_path) in enumerate(items):
+                future = decode_executor.submit(self.decode, image_path, cache)
+                if not self.put(decoded_queue, (seq, filename, image_path, future)):
+                    return
+        finally:
+            self.put(decoded_queue, _STOP)
+
+    def detect_stage(self, decoded_queue, ocr_queue):
+        try:
+            finished = False
+            while not finished and not self.stop_event.is_set():
+                batch = [self.get(decoded_queue)]
+                if batch[0] is _STOP:
+                    break
+                while len(batch) < self.batch_size:
+                    try:
+                        item = decoded_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        finished = True
+                        break
+                    batch.append(item)
+
+                self.detect_batch(batch, ocr_queue)
+        finally:
+            self.put(ocr_queue, _STOP)
+
+    def detect_batch(self, batch, ocr_queue):
+        records = []
+        for seq, filename, image_path, future in batch:
+            record = {'seq': seq, 'filename': filename, 'image_path': image_path, 'image': None,
+                      'cache_key': None, 'cached': None, 'plates': None, 'ocr': None, 'error': None,
+                      'timings': {}}
+            try:
+                (record['image'], record['cache_key'], record['cached']), record['timings'] = future.result()
+            except Exception as e:
+                record['error'] = e
+            records.append(record)
+
+        loaded = [record for record in records if record['error'] is None and record['cached'] is None]
+        if loaded:
+            try:
+                batch_plates = self.pipeline.detector.detect_plates_batch(
+                    [record['image'] for record in loaded], batch_size=self.batch_size,
+                    timings=[record['timings'] for record in loaded]
+                )
+                # One OCR job per detection batch keeps cross-plate batching
+                # intact; each record remembers its slice of the job's results.
+                crops = []
+                for record, detected_plates in zip(loaded, batch_plates):
+                    record['plates'] = detected_plates
+                    record['ocr_slice'] = (len(crops), len(crops) + len(detected_plates))
+                    crops.extend(plate['cropped_image'] for plate in detected_plates)
+                ocr_job = self.submit_ocr(crops)
+                for record in loaded:
+                    record['ocr'] = ocr_job
+            except Exception as e:
+                for record in loaded:
+                    record['error'] = e
+
+        if not self.pipeline.artifact_writer.annotate_frames:
+            for record in records:
+                record['image'] = None
+        self.put(ocr_queue, records)
+
+    def run(self, items, batch_output_dir, timestamp, cache=None):
+        self.stop_event = threading.Event()
+        decoded_queue = queue.Queue(maxsize=self.queue_depth)
+        # ocr_queue holds one entry per detection batch, i.e. per OCR job, and
+        # is deep enough to keep every OCR worker busy.
+        ocr_jobs = max(self.ocr_workers + 1, 2, -(-self.queue_depth // self.batch_size))
+        ocr_queue = queue.Queue(maxsize=ocr_jobs)
+        decode_executor = ThreadPoolExecutor(max_workers=self.decode_workers)
+        owns_executor = self.ocr_executor is None
+        if owns_executor:
+            self.ocr_executor = self.create_ocr_executor()
+            self.ocr_restarts = 0
+
+        stages = [
+            threading.Thread(target=self.decode_stage, args=(items, decode_executor, decoded_queue, cache), daemon=True),
+            threading.Thread(target=self.detect_stage, args=(decoded_queue, ocr_queue), daemon=True)
+        ]
+        for stage in stages:
+            stage.start()
+
+        try:
+            # Every queue is FIFO and each stage handles items in sequence, so
+            # results reach the writer in input order.
+            while True:
+                records = ocr_queue.get()
+                if records is _STOP:
+                    break
+                for record in records:
+                    yield self.write_result(record, batch_output_dir, timestamp, cache)
+        finally:
+            self.stop_event.set()
+            for stage in stages:
+                stage.join()
+            decode_executor.shutdown(wait=True)
+            if owns_executor:
+                self.close()
+
+    def write_result(self, record, batch_output_dir, timestamp, cache=None):
+        filename = record['filename']
+        if isinstance(record['error'], BrokenProcessPool):
+            raise record['error']
+        if record['error'] is None:
+            try:
+                # The extension is kept so x.jpg and x.png do not share a directory.
+                stem = filename.replace('/', '_')
+                result_dir = os.path.join(batch_output_dir, f"result_{timestamp}_{stem}")
+                if record['cached'] is not None:
+                    result = self.pipeline.replay_cached(record['image_path'], record['cached'], timestamp, result_dir,
+                                                         timings=record['timings'])
+                else:
+                    start, end = record['ocr_slice']
+                    batch_results, ocr_timings = self.ocr_result(record['ocr'])
+                    ocr_results = batch_results[start:end]
+                    error = crop_error(ocr_results)
+                    if error is not None:
+                        raise error
+                    timings = record['timings']
+                    share = (end - start) / float(len(batch_results)) if batch_results else 0.0
+                    for stage, seconds in ocr_timings.items():
+                        timings[stage] = timings.get(stage, 0.0) + seconds * share
+                    with timed(timings, 'artifact_write'):
+                        self.pipeline.save_crops(record['plates'], os.path.join(result_dir, "detected_plates"))
+                    result = self.pipeline.recognize_plates(record['image_path'], record['plates'], timestamp,
+                                                            result_dir, ocr_results=ocr_results,
+                                                            image=record['image'], timings=timings)
+                    if cache is not None:
+                        with timed(timings, 'cache_store'):
+                            self.pipeline.store_cached(cache, record['cache_key'], result)
+                result['filename'] = filename
+                return result
+            except BrokenProcessPool:
+                # The pool could not be recovered; stop instead of turning
+                # every remaining image into an error entry.
+                raise
+            except Exception as e:
+                record['error'] = e
+
+        return {'filename': filename, 'input_image': record['image_path'], 'error': str(record['error'])}
@@ -0,0 +1,73 @@
+import os
+import json
+import pytest
+from input_sources import iter_inputs, in_shard, parse_shard
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'')
+
+def make_tree(root):
+    for name in ('b.jpg', 'a.png', 'notes.txt', 'sub/z.jpg', 'sub/deeper/c.JPG', 'a_dir/y.bmp'):
+        touch(os.path.join(root, name))
+
+def test_shards_split_inputs_without_overlap():
+    names = [f"cam{idx % 7}/frame_{idx:05d}.jpg" for idx in range(2000)]
+    for count in (1, 2, 3, 8):
+        shards = [[name for name in names if in_shard(name, (index, count))] for index in range(count)]
+        assert sorted(name for shard in shards for name in shard) == sorted(names)
+        assert sum(len(shard) for shard in shards) == len(names)
+
+def test_iter_inputs_shards_cover_directory(tmp_path):
+    make_tree(str(tmp_path))
+    everything = list(iter_inputs(str(tmp_path), recursive=True))
+    shards = [list(iter_inputs(str(tmp_path), recursive=True, shard=f"{index}/3")) for index in range(3)]
+    assert sorted(item for shard in shards for item in shard) == sorted(everything)
+    assert sum(len(shard) for shard in shards) == len(everything)
+
+def test_parse_shard_rejects_bad_specs():
+    assert parse_shard("2/4") == (2, 4)
+    for spec in ("4/4", "-1/4", "1/0", "1", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+def test_recursive_scan_order(tmp_path):
+    # Each directory's files by name, then its subdirectories by name.
+    make_tree(str(tmp_path))
+    names = [name for name, _ in iter_inputs(str(tmp_path), recursive=True)]
+    assert names == ['a.png', 'b.jpg', 'a_dir/y.bmp', 'sub/z.jpg', 'sub/deeper/c.JPG']
+    assert [name for name, _ in iter_inputs(str(tmp_path))] == ['a.png', 'b.jpg']
+
+def test_recursive_scan_does_not_follow_symlink_loops(tmp_path):
+    make_tree(str(tmp_path))
+    try:
+        os.symlink(str(tmp_path), str(tmp_path / 'sub' / 'loop'))
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks are not available")
+    names = [name for name, _ in iter_inputs(str(tmp_path), recursive=True)]
+    assert names == ['a.png', 'b.jpg', 'a_dir/y.bmp', 'sub/z.jpg', 'sub/deeper/c.JPG']
+
+def test_manifest_resolves_relative_paths(tmp_path):
+    make_tree(str(tmp_path / 'images'))
+    absolute = str(tmp_path / 'images' / 'b.jpg')
+    manifest = tmp_path / 'lists' / 'manifest.txt'
+    os.makedirs(str(manifest.parent))
+    manifest.write_text('\n'.join([
+        '# comment',
+        '../images/sub/z.jpg',
+        json.dumps({'path': '../images/a.png'}),
+        '../images/notes.txt',
+        absolute,
+        ''
+    ]), encoding='utf-8')
+
+    items = list(iter_inputs(str(manifest)))
+    assert [name for name, _ in items] == ['../images/sub/z.jpg', '../images/a.png', absolute.replace(os.sep, '/')]
+    assert [os.path.normpath(path) for _, path in items] == [
+        str(tmp_path / 'images' / 'sub' / 'z.jpg'), str(tmp_path / 'images' / 'a.png'), absolute
+    ]
+
+def test_missing_source_raises(tmp_path):
+    with pytest.raises(ValueError):
+        iter_inputs(str(tmp_path / 'missing'))
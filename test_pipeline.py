@@ -88,6 +88,30 @@ def test_pipeline():
         import traceback
         traceback.print_exc()
 
+def test_detector_backend_parity(tmp_path):
+    import pytest
+    
+    examples_dir = "examples"
+    if not os.path.exists(examples_dir):
+        pytest.skip(f"Examples directory not found: {examples_dir}")
+    pytest.importorskip("onnxruntime")
+    
+    from benchmark_detector import compare_backends
+    
+    # Exported models go to a temporary directory, not the working tree.
+    report = compare_backends(examples_dir, backends=('torch', 'onnx', 'torchscript'), repeats=1,
+                              backend_dir=str(tmp_path))
+    if report is None:
+        pytest.skip(f"No images found in {examples_dir}")
+    
+    for name in ('onnx', 'torchscript'):
+        parity = report[name]['parity']
+        print(f"{name}: recall vs torch {parity['recall']:.0%}, "
+              f"max confidence delta {parity['max_confidence_delta']:.3f}, "
+              f"{report[name]['mean_ms']:.1f} ms vs {report['torch']['mean_ms']:.1f} ms")
+        assert parity['recall'] >= 0.9
+        assert parity['max_confidence_delta'] <= 0.05
+
 def list_available_images():
     examples_dir = "examples"
     if not os.path.exists(examples_dir):
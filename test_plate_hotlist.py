@@ -0,0 +1,66 @@
+import random
+from plate_hotlist import PlateHotlist, canonical_plate, weighted_distance
+
+def random_plates(rng, count):
+    alphabet = 'AB08OSI15XYZ'
+    return sorted({''.join(rng.choice(alphabet) for _ in range(rng.randint(4, 7))) for _ in range(count)})
+
+def brute_force(plates, query, max_distance, confusion_cost):
+    matches = []
+    for plate in plates:
+        distance = weighted_distance(query, plate, confusion_cost)
+        if distance <= max_distance:
+            matches.append((distance, plate))
+    return sorted(matches)
+
+def test_lookup_matches_brute_force():
+    rng = random.Random(0)
+    plates = random_plates(rng, 300)
+    for max_distance in (0, 1, 2):
+        hotlist = PlateHotlist(plates, max_distance=max_distance, confusion_cost=0.25)
+        queries = plates[:40] + random_plates(rng, 80)
+        for query in queries:
+            found = [(match['distance'], match['plate']) for match in hotlist.lookup(query)]
+            assert found == brute_force(plates, query, max_distance, 0.25), query
+
+def test_confusions_cost_less_than_edits():
+    hotlist = PlateHotlist([('AB123', 'stolen')], max_distance=1, confusion_cost=0.25)
+    assert hotlist.lookup('A8123') == [{'plate': 'AB123', 'distance': 0.25, 'label': 'stolen'}]
+    assert hotlist.lookup('AB1234')[0]['distance'] == 1.0
+    assert hotlist.lookup('ZZ999') == []
+
+def test_remove_collapses_shared_buckets():
+    hotlist = PlateHotlist(['AB123', 'AB124', 'AB12'], max_distance=1)
+    shared = canonical_plate('AB12')
+    assert sorted(hotlist.index[shared]) == sorted(hotlist.ids[plate] for plate in ('AB123', 'AB124', 'AB12'))
+
+    assert hotlist.remove('AB124')
+    assert sorted(hotlist.index[shared]) == sorted([hotlist.ids['AB123'], hotlist.ids['AB12']])
+    assert hotlist.remove('AB12')
+    assert hotlist.index[shared] == hotlist.ids['AB123']
+    assert [match['plate'] for match in hotlist.lookup('AB12')] == ['AB123']
+
+    assert hotlist.remove('AB123')
+    assert not hotlist.remove('AB123')
+    assert hotlist.index == {}
+    assert len(hotlist) == 0
+
+def test_removed_ids_are_reused():
+    hotlist = PlateHotlist(['AB123', 'CD456'], max_distance=1)
+    removed_id = hotlist.ids['AB123']
+    hotlist.remove('AB123')
+    assert 'AB123' not in hotlist
+    assert hotlist.lookup('AB123') == []
+
+    hotlist.add('EF789', 'new')
+    assert hotlist.ids['EF789'] == removed_id
+    assert len(hotlist.plates) == 2
+    assert hotlist.lookup('EF789') == [{'plate': 'EF789', 'distance': 0.0, 'label': 'new'}]
+    assert [match['plate'] for match in hotlist.lookup('CD456')] == ['CD456']
+
+def test_add_again_updates_label_only():
+    hotlist = PlateHotlist([('AB123', 'old')], max_distance=1)
+    hotlist.add('ab-123', 'new')
+    assert len(hotlist) == 1
+    assert len(hotlist.plates) == 1
+    assert hotlist.lookup('AB123') == [{'plate': 'AB123', 'distance': 0.0, 'label': 'new'}]
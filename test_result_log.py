@@ -0,0 +1,95 @@
+import json
+import pytest
+from result_log import ResultLog
+
+def make_items(count):
+    return [(f"img_{idx}.jpg", f"/data/img_{idx}.jpg") for idx in range(count)]
+
+def write_run(path, items, failing=()):
+    log = ResultLog(path, flush_every=1)
+    for name, image_path in log.remaining(items):
+        if image_path in failing:
+            log.append({'filename': name, 'input_image': image_path, 'error': 'boom'})
+        else:
+            log.append({'filename': name, 'input_image': image_path, 'detected_plates': 0})
+    log.close()
+
+def read_entries(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_torn_trailing_line_is_truncated(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    items = make_items(3)
+    write_run(path, items[:2])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"filename": "img_2.jpg", "input_ima')
+
+    log = ResultLog(path)
+    assert log.attempted == 2
+    assert log.completed == 2
+    assert list(log.remaining(items)) == items[2:]
+    log.close()
+    assert len(read_entries(path)) == 2
+
+def test_failed_entries_are_retried_first(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    items = make_items(5)
+    write_run(path, items[:3], failing={items[1][1]})
+
+    log = ResultLog(path)
+    assert log.attempted == 3
+    assert log.completed == 2
+    assert log.failed == {items[1][1]}
+    assert list(log.remaining(items)) == [items[1], items[3], items[4]]
+    log.close()
+
+def test_seq_follows_input_positions(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    items = make_items(5)
+    write_run(path, items[:3], failing={items[1][1]})
+    write_run(path, items)
+
+    entries = read_entries(path)
+    assert [entry['seq'] for entry in entries] == [0, 1, 2, 1, 3, 4]
+    assert [entry['input_image'] for entry in entries[3:]] == [items[1][1], items[3][1], items[4][1]]
+
+    log = ResultLog(path)
+    assert log.attempted == 5
+    assert log.completed == 5
+    assert log.failed == set()
+    assert list(log.remaining(items)) == []
+    log.close()
+
+def test_retry_that_fails_again_stays_failed(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    items = make_items(3)
+    write_run(path, items, failing={items[0][1]})
+    write_run(path, items, failing={items[0][1]})
+
+    log = ResultLog(path)
+    assert log.attempted == 3
+    assert log.failed == {items[0][1]}
+    log.close()
+
+def test_mismatched_inputs_raise(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    items = make_items(3)
+    write_run(path, items)
+
+    log = ResultLog(path)
+    with pytest.raises(ValueError, match="do not match"):
+        log.remaining(make_items(4)[1:])
+    with pytest.raises(ValueError, match="Fewer inputs"):
+        log.remaining(items[:2])
+    log.close()
+
+def test_resume_false_starts_over(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    items = make_items(3)
+    write_run(path, items)
+
+    log = ResultLog(path, resume=False)
+    assert log.attempted == 0
+    assert list(log.remaining(items)) == items
+    log.close()
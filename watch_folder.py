@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+from input_sources import IMAGE_EXTENSIONS
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len].
+_EVENT = struct.Struct('iIII')
+
+def existing_files(directories, extensions=IMAGE_EXTENSIONS):
+    return sorted(file_signatures(directories, extensions))
+
+def file_signatures(directories, extensions=IMAGE_EXTENSIONS):
+    signatures = {}
+    for directory in directories:
+        with os.scandir(directory) as scanner:
+            for entry in scanner:
+                if entry.is_file() and entry.name.lower().endswith(extensions):
+                    stat = entry.stat()
+                    signatures[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return signatures
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+class InotifyWatcher:
+    # Linux only. IN_CLOSE_WRITE fires once the writer closes the file and
+    # IN_MOVED_TO once a finished file is renamed in, so every reported path
+    # is complete. Writes made on another machine to a network share do not
+    # raise inotify events; use PollingWatcher for those. If the event queue
+    # overflows, the folders are rescanned and every file not yet reported
+    # (or changed since) is queued.
+    def __init__(self, directories, process_existing=False, extensions=IMAGE_EXTENSIONS):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.extensions = extensions
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        
+        self.directories = {}
+        try:
+            for directory in directories:
+                wd = libc.inotify_add_watch(self.fd, os.fsencode(directory),
+                                            IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+                self.directories[wd] = directory
+        except OSError:
+            os.close(self.fd)
+            raise
+        
+        # Signatures of the files already reported; files moved away or
+        # deleted are dropped again.
+        self.seen = {}
+        if process_existing:
+            self.backlog = existing_files(directories, extensions)
+        else:
+            self.seen = file_signatures(directories, extensions)
+            self.backlog = []
+    
+    def wait(self, timeout=1.0):
+        if self.backlog:
+            ready, self.backlog = self.backlog, []
+            return self.mark_seen(ready)
+        
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        
+        data = os.read(self.fd, 64 * 1024)
+        ready = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            
+            if mask & IN_Q_OVERFLOW:
+                print("Warning: inotify queue overflowed and events were lost; rescanning the watched folders "
+                      "(raise fs.inotify.max_queued_events to avoid this)")
+                ready.extend(self.rescan())
+                continue
+            directory = self.directories.get(wd)
+            if directory is None or not name.lower().endswith(self.extensions):
+                continue
+            path = os.path.join(directory, name)
+            if mask & (IN_MOVED_FROM | IN_DELETE):
+                self.seen.pop(path, None)
+            elif path not in ready:
+                ready.append(path)
+        return self.mark_seen(ready)
+    
+    def rescan(self):
+        current = file_signatures(self.directories.values(), self.extensions)
+        self.seen = {path: signature for path, signature in self.seen.items() if path in current}
+        return sorted(path for path, signature in current.items() if self.seen.get(path) != signature)
+    
+    def mark_seen(self, paths):
+        # Skips paths reported again unchanged, e.g. by a rescan and a
+        # late event for the same file.
+        ready = []
+        for path in paths:
+            signature = file_signature(path)
+            if signature is None or self.seen.get(path) == signature:
+                continue
+            self.seen[path] = signature
+            ready.append(path)
+        return ready
+    
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+class PollingWatcher:
+    # A file is ready once its size and mtime have not changed for
+    # settle_time seconds, which also works for network shares.
+    def __init__(self, directories, process_existing=False, settle_time=1.0, extensions=IMAGE_EXTENSIONS):
+        self.directories = list(directories)
+        self.settle_time = settle_time
+        self.extensions = extensions
+        self.pending = {}
+        self.seen = {}
+        self.first_scan = True
+        if not process_existing:
+            self.seen = self.scan()
+            self.first_scan = False
+    
+    def scan(self):
+        return file_signatures(self.directories, self.extensions)
+    
+    def wait(self, timeout=1.0):
+        if not self.first_scan:
+            time.sleep(timeout)
+        self.first_scan = False
+        
+        now = time.monotonic()
+        current = self.scan()
+        ready = []
+        for path, signature in current.items():
+            if self.seen.get(path) == signature:
+                continue
+            previous = self.pending.get(path)
+            if previous is None or previous[0] != signature:
+                self.pending[path] = (signature, now)
+            elif now - previous[1] >= self.settle_time and signature[0] > 0:
+                ready.append(path)
+                self.seen[path] = signature
+                del self.pending[path]
+        
+        # Files that were moved away or deleted are forgotten, so memory
+        # follows what is in the folders rather than everything ever seen.
+        self.seen = {path: signature for path, signature in self.seen.items() if path in current}
+        self.pending = {path: state for path, state in self.pending.items() if path in current}
+        return sorted(ready)
+    
+    def close(self):
+        pass
+
+def create_watcher(directories, use_inotify=True, process_existing=False, settle_time=1.0,
+                   extensions=IMAGE_EXTENSIONS):
+    if use_inotify and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directories, process_existing, extensions)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({str(e)}), falling back to polling")
+    return PollingWatcher(directories, process_existing, settle_time, extensions)